@@ -0,0 +1,532 @@
+"""
+Per-room game actors for CaroGameConsumer
+
+Each room with connected sockets gets one GameActor: an asyncio task that
+owns the game state and applies moves strictly in order, so two fast
+clicks can never race. Moves are validated against the in-memory board
+and then written with one CaroMove INSERT plus a counter UPDATE guarded
+by the expected move number. A move is only confirmed (and broadcast)
+once that write succeeds. When it matches no row, someone else (the REST
+API, a turn timeout, an actor on another worker) changed the game: the
+actor reloads from the database and validates the move again.
+A winning move is settled (winner, payout, stats) in the same transaction.
+
+Sockets receive one full snapshot on connect and small ``game_move``
+deltas afterwards; the move number doubles as the delta sequence.
+
+Spectators sit in a separate group. Their deltas are merged by the actor
+and sent at most once per CARO_SPECTATOR_FANOUT_INTERVAL, so the number
+of watchers adds no work to the players' per-move broadcast.
+"""
+import asyncio
+import json
+import logging
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction, DatabaseError
+from django.utils import timezone
+
+from . import movelog, snapshots
+from .engine import CaroBoard, discard_board
+from .models import CaroGame, CaroMove
+
+logger = logging.getLogger(__name__)
+
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 0.2  # seconds, doubled after each failed attempt
+SNAPSHOT_TIMEOUT = 300  # seconds a serialized snapshot stays in the cache
+SPECTATOR_INTERVAL = getattr(settings, 'CARO_SPECTATOR_FANOUT_INTERVAL', 1.0)
+SPECTATOR_COUNT_TIMEOUT = 60 * 60 * 6
+
+
+class MoveConflict(Exception):
+    """The game row changed outside this actor (other worker, REST move or abandon...)"""
+
+
+class GameActor:
+    """Single writer owning one room's Caro game state"""
+
+    def __init__(self, room_name):
+        self.room_name = room_name
+        self.consumers = 0
+        self.game = None
+        self.board = None
+        self.move_log = b''
+        self.state = None
+        self.snapshot_text = None
+        self.stale = True
+        self.spectator_moves = []
+        self.spectator_resync = False
+        self.spectator_flush = None
+        self.spectators_sent = None
+        self.inbox = asyncio.Queue()
+        self.task = asyncio.create_task(self.run())
+
+    # ---------------------------
+    # Public API (called by consumers)
+    # ---------------------------
+    @property
+    def seq(self):
+        """Sequence number of the last applied move"""
+        return self.state['total_moves'] if self.state else 0
+
+    async def get_snapshot(self):
+        """Serialized ``game_state`` message for the current game version"""
+        return await self.call('get_snapshot')
+
+    async def refresh(self):
+        """Reload the game from the database (e.g. after a REST join)"""
+        return await self.call('refresh')
+
+    async def reload(self, version=None):
+        """
+        Reload after an external change announced at ``version`` (updated_at timestamp).
+
+        Every player socket of the room receives the same announcement: the
+        first one reloads and resyncs spectators, the others just get the
+        snapshot.
+        """
+        return await self.call('reload', version)
+
+    async def submit_move(self, user, row, col):
+        """Queue a move and wait for the actor to apply it"""
+        return await self.call('move', user, row, col)
+
+    def is_player(self, username):
+        """True if ``username`` plays in the loaded game"""
+        if not self.state or not username:
+            return False
+        return any(
+            player and player['username'] == username
+            for player in (self.state['player1'], self.state['player2'])
+        )
+
+    def queue_spectator_event(self, event=None, reload=False):
+        """
+        Merge a move delta into the next spectator broadcast.
+
+        Without an event, spectators get the full state instead (the game
+        was reloaded, e.g. after a join or a turn timeout); ``reload``
+        makes the actor reload it from the database first.
+        """
+        if event is None:
+            self.spectator_resync = 'reload' if reload or self.spectator_resync == 'reload' else True
+            self.spectator_moves = []
+        elif not self.spectator_resync:
+            self.spectator_moves.append(event)
+        if self.spectator_flush is None:
+            self.spectator_flush = asyncio.create_task(self._flush_spectators_later())
+
+    def spectators_changed(self):
+        """Schedule a broadcast carrying the new spectator count"""
+        if self.spectator_flush is None:
+            self.spectator_flush = asyncio.create_task(self._flush_spectators_later())
+
+    async def call(self, action, *args):
+        future = asyncio.get_running_loop().create_future()
+        await self.inbox.put((action, args, future))
+        return await future
+
+    async def stop(self):
+        """Flush pending spectator updates and stop the actor task"""
+        if self.spectator_flush is not None:
+            # Spectators on other workers may still be waiting for these moves
+            self.spectator_flush.cancel()
+            await self.flush_spectators()
+        self.task.cancel()
+
+    # ---------------------------
+    # Spectator fanout
+    # ---------------------------
+    async def _flush_spectators_later(self):
+        await asyncio.sleep(SPECTATOR_INTERVAL)
+        await self.flush_spectators()
+
+    async def flush_spectators(self):
+        """Send the merged spectator update (one group message per interval)"""
+        self.spectator_flush = None
+        events, resync = self.spectator_moves, self.spectator_resync
+        self.spectator_moves, self.spectator_resync = [], False
+
+        try:
+            channel_layer = get_channel_layer()
+            spectators = await get_spectator_count(self.room_name)
+
+            if resync:
+                snapshot = await (self.refresh() if resync == 'reload' else self.get_snapshot())
+                if snapshot:
+                    await channel_layer.group_send(spectator_group(self.room_name), {
+                        'type': 'spectator_state',
+                        'snapshot': snapshot,
+                        'spectators': spectators,
+                    })
+            elif events or spectators != self.spectators_sent:
+                latest = events[-1] if events else {
+                    'seq': self.seq,
+                    'current_turn': self.state['current_turn'] if self.state else None,
+                    'status': self.state['status'] if self.state else None,
+                    'winner': self.state['winner'] if self.state else None,
+                }
+                await channel_layer.group_send(spectator_group(self.room_name), {
+                    'type': 'spectator_update',
+                    'data': {
+                        'seq': latest['seq'],
+                        'moves': [event['move'] for event in events],
+                        'current_turn': latest['current_turn'],
+                        'status': latest['status'],
+                        'winner': latest['winner'],
+                        'spectators': spectators,
+                    }
+                })
+
+            if spectators != self.spectators_sent:
+                self.spectators_sent = spectators
+                await channel_layer.group_send(f'caro_game_{self.room_name}', {
+                    'type': 'spectator_count',
+                    'spectators': spectators,
+                })
+        except Exception as e:
+            logger.error(f"GameActor {self.room_name} spectator fanout failed: {e}", exc_info=True)
+
+    # ---------------------------
+    # Actor loop
+    # ---------------------------
+    async def run(self):
+        while True:
+            action, args, future = await self.inbox.get()
+            try:
+                if action == 'move':
+                    result = await self.handle_move(*args)
+                elif action == 'reload':
+                    result = await self.handle_reload(*args)
+                else:
+                    if self.stale or action == 'refresh':
+                        await self.load()
+                    result = await self.snapshot()
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"GameActor {self.room_name} failed on {action}: {e}", exc_info=True)
+                self.stale = True
+                if not future.done():
+                    future.set_exception(e)
+
+    async def handle_reload(self, version):
+        loaded = self.game.updated_at.timestamp() if self.game is not None else None
+        if self.stale or loaded is None or version is None or loaded < version:
+            await self.load()
+            self.queue_spectator_event()
+        return await self.snapshot()
+
+    async def snapshot(self):
+        """
+        Full state as JSON text, built at most once per game version.
+
+        Kept on the actor and in the shared cache, so reconnecting sockets
+        (or a fresh actor on another worker) reuse the serialized payload.
+        """
+        if self.state is None:
+            return None
+        if self.snapshot_text is None:
+            key = snapshot_key(self.game.pk, self.seq, self.state['status'])
+            self.snapshot_text = await cache.aget(key)
+            if self.snapshot_text is None:
+                self.snapshot_text = json.dumps({'type': 'game_state', 'data': self.state})
+                # A settled game never changes again, keep it as long as the REST snapshots
+                final = snapshots.is_final(self.state['status'])
+                timeout = snapshots.SNAPSHOT_TIMEOUT if final else SNAPSHOT_TIMEOUT
+                await cache.aset(key, self.snapshot_text, timeout=timeout)
+        return self.snapshot_text
+
+    async def load(self):
+        """(Re)build the in-memory state from the database"""
+        self.game, self.board, self.move_log, self.state = await database_sync_to_async(self._load)()
+        self.snapshot_text = None
+        self.stale = False
+
+    def _load(self):
+        game = (
+            CaroGame.objects
+            .filter(room_name=self.room_name)
+            .select_related('player1', 'player2', 'winner')
+            .order_by('-created_at')
+            .first()
+        )
+        if game is None:
+            return None, None, b'', None
+
+        # Rebuilt once from rows for games not compacted yet
+        game.move_log = log = game.get_move_log()
+        moves = game.get_move_records()
+        # The actor keeps a private board: the shared engine registry is
+        # also used by the REST path and must not see unpersisted stones
+        board = None
+        if game.status == 'playing':
+            board = CaroBoard.from_moves(
+                [(move['row'], move['col'], move['symbol']) for move in moves],
+                win_condition=game.win_condition
+            )
+        return game, board, log, build_game_state(game, moves)
+
+    def check_move(self, user, row, col):
+        """(symbol, None) if the move is valid on the loaded game, else (None, message)"""
+        game = self.game
+        if game is None:
+            return None, 'Game not found'
+        if game.status != 'playing':
+            return None, 'Game is not in playing status'
+
+        symbol = game.get_player_symbol(user)
+        if symbol is None:
+            return None, 'Not a player in this game'
+        if symbol != game.current_turn:
+            return None, 'Not your turn'
+        if not self.board.in_bounds(row, col):
+            return None, 'Invalid move position'
+        if not self.board.is_empty(row, col):
+            return None, 'Position already occupied'
+        return symbol, None
+
+    async def handle_move(self, user, row, col):
+        if not user or not user.is_authenticated:
+            return {'success': False, 'message': 'Not authenticated'}
+
+        if self.stale:
+            await self.load()
+
+        symbol, error = self.check_move(user, row, col)
+        if error:
+            # Our copy may be behind a write made elsewhere (REST join or move, other worker)
+            await self.load()
+            symbol, error = self.check_move(user, row, col)
+        if error:
+            return {'success': False, 'message': error}
+
+        for attempt in range(2):
+            game = self.game
+            won = self.board.place(row, col, symbol)
+            move_number = game.total_moves + 1
+            next_turn = symbol if won else ('O' if symbol == 'X' else 'X')
+            now = timezone.now()
+            move_log = movelog.append(self.move_log, row, col, now)
+            try:
+                written = await self.persist(
+                    (game.pk, user.id, row, col, symbol, move_number, next_turn, move_log, won)
+                )
+            except MoveConflict:
+                written = None
+            if written:
+                break
+
+            # Not on disk: rebuild from the database before answering
+            await self.load()
+            if written is False:
+                return {'success': False, 'message': 'Could not save the move, please retry'}
+            symbol, error = self.check_move(user, row, col)
+            if error:
+                return {'success': False, 'message': error}
+        else:
+            return {'success': False, 'message': 'Game changed, please retry'}
+
+        game.total_moves = move_number
+        game.current_turn = next_turn
+        self.move_log = move_log
+        move = {
+            'row': row,
+            'col': col,
+            'symbol': symbol,
+            'move_number': move_number,
+            'player_username': user.username,
+            'timestamp': now.isoformat(),
+        }
+        self.state['moves'].append(move)
+        self.snapshot_text = None
+        self.state['total_moves'] = game.total_moves
+        self.state['current_turn'] = game.current_turn
+
+        if won:
+            self.finalize(written)
+
+        return {
+            'success': True,
+            'message': 'Move successful',
+            'event': {
+                'seq': move_number,
+                'move': move,
+                'current_turn': self.state['current_turn'],
+                'status': self.state['status'],
+                'winner': self.state['winner'],
+            }
+        }
+
+    def finalize(self, game):
+        """Adopt the game row settled together with the winning move"""
+        self.game = game
+        discard_board(self.game.pk)
+        self.board = None
+        self.snapshot_text = None
+        winner = self.game.winner
+        self.state.update({
+            'status': self.game.status,
+            'winner': {
+                'username': winner.username,
+                'display_name': winner.first_name or winner.username,
+            } if winner else None,
+        })
+
+    # ---------------------------
+    # Persistence
+    # ---------------------------
+    async def persist(self, move):
+        """
+        Write one move, retrying transient database errors.
+
+        Returns True once stored (the settled CaroGame for a winning move),
+        False after giving up; raises MoveConflict when the guarded UPDATE
+        finds the game at another move.
+        """
+        delay = WRITE_RETRY_DELAY
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                settled = await database_sync_to_async(persist_move)(*move)
+                return settled or True
+            except MoveConflict as e:
+                logger.info(f"GameActor {self.room_name} move {move[5]} conflicted: {e}")
+                raise
+            except DatabaseError as e:
+                logger.error(f"GameActor {self.room_name} write attempt {attempt} failed: {e}")
+                await asyncio.sleep(delay)
+                delay *= 2
+
+        logger.error(f"GameActor {self.room_name} gave up persisting move {move[5]}")
+        return False
+
+
+def snapshot_key(game_pk, seq, status):
+    """Cache key of the serialized snapshot for one game version"""
+    return f"caro_snapshot_{game_pk}_{seq}_{status}"
+
+
+def persist_move(game_pk, player_id, row, col, symbol, move_number, next_turn, move_log, won=False):
+    """
+    Store one move: a single INSERT and a counter/log UPDATE guarded by the move number and turn.
+
+    A winning move settles the game (winner, payout, stats) in the same
+    transaction, so the row is never left "playing" on a won board; the
+    settled game is returned in that case.
+    """
+    with transaction.atomic():
+        updated = CaroGame.objects.filter(
+            pk=game_pk,
+            status='playing',
+            current_turn=symbol,
+            total_moves=move_number - 1
+        ).update(
+            total_moves=move_number,
+            current_turn=next_turn,
+            move_log=move_log,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            raise MoveConflict("game is no longer at the expected move")
+
+        CaroMove.objects.create(
+            game_id=game_pk,
+            player_id=player_id,
+            row=row,
+            col=col,
+            symbol=symbol,
+            move_number=move_number
+        )
+
+        if not won:
+            return None
+        # The guarded UPDATE above already holds the row lock
+        CaroGame.objects.select_for_update().get(pk=game_pk).finish_game(symbol)
+
+    return CaroGame.objects.select_related('player1', 'player2', 'winner').get(pk=game_pk)
+
+
+def build_game_state(game, moves):
+    """Full game state dict sent to game sockets"""
+    return {
+        'id': game.id,
+        'game_id': game.game_id,
+        'room_name': game.room_name,
+        'player1': {
+            'username': game.player1.username,
+            'display_name': game.player1.first_name or game.player1.username,
+        },
+        'player2': {
+            'username': game.player2.username,
+            'display_name': game.player2.first_name or game.player2.username,
+        } if game.player2 else None,
+        'current_turn': game.current_turn,
+        'status': game.status,
+        'winner': {
+            'username': game.winner.username,
+            'display_name': game.winner.first_name or game.winner.username,
+        } if game.winner else None,
+        'total_moves': game.total_moves,
+        'moves': moves,
+        'bet_amount': game.bet_amount,
+        'total_pot': game.total_pot,
+        'winner_prize': game.winner_prize,
+        'house_fee': game.house_fee,
+    }
+
+
+# ===========================
+# SPECTATORS
+# ===========================
+def spectator_group(room_name):
+    """Channel group of a room's spectators (players use caro_game_<room>)"""
+    return f'caro_watch_{room_name}'
+
+
+def _spectator_count_key(room_name):
+    return f'caro_spectators_{room_name}'
+
+
+async def add_spectator(room_name, delta=1):
+    """Adjust the room's spectator count (shared by all workers)"""
+    key = _spectator_count_key(room_name)
+    await cache.aadd(key, 0, timeout=SPECTATOR_COUNT_TIMEOUT)
+    try:
+        return await cache.aincr(key, delta)
+    except ValueError:  # expired between add and incr
+        return 0
+
+
+async def get_spectator_count(room_name):
+    return max(0, await cache.aget(_spectator_count_key(room_name)) or 0)
+
+
+# ===========================
+# ACTOR REGISTRY
+# ===========================
+_actors = {}
+
+
+def acquire_actor(room_name):
+    """Get (or start) the actor for a room and register one consumer on it"""
+    actor = _actors.get(room_name)
+    if actor is None:
+        actor = _actors[room_name] = GameActor(room_name)
+    actor.consumers += 1
+    return actor
+
+
+async def release_actor(room_name):
+    """Unregister a consumer; the last one out stops the actor"""
+    actor = _actors.get(room_name)
+    if actor is None:
+        return
+
+    actor.consumers -= 1
+    if actor.consumers <= 0:
+        _actors.pop(room_name, None)
+        await actor.stop()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CaroGame, CaroMove
+from .models import CaroGame, CaroMove, PlayerStats
 
 
 @admin.register(CaroGame)
@@ -24,4 +24,9 @@ class CaroMoveAdmin(admin.ModelAdmin):
     ordering = ['game', 'move_number']
 
 
-
+@admin.register(PlayerStats)
+class PlayerStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'rating', 'games_played', 'games_won', 'games_lost', 'games_drawn', 'best_streak', 'total_winnings']
+    search_fields = ['user__username']
+    readonly_fields = ['updated_at']
+    ordering = ['-rating']
@@ -3,13 +3,16 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
+from django.db import transaction
 from django.db.models import Q, Count, Case, When, IntegerField
+from django.http import HttpResponse
 from drf_yasg.utils import swagger_auto_schema
 
-from .models import CaroGame
+from . import snapshots
+from .models import CaroGame, PlayerStats
 from .serializers import (
-    CaroGameSerializer, CaroGameCreateSerializer, 
-    CaroMoveSerializer, CaroGameStatsSerializer
+    CaroGameSerializer, CaroGameListSerializer, CaroGameCreateSerializer, 
+    CaroMoveSerializer, CaroGameStatsSerializer, PlayerStatsSerializer
 )
 
 
@@ -22,19 +25,56 @@ class CaroGameViewSet(viewsets.ModelViewSet):
     filterset_fields = ['status', 'player1', 'player2']
     ordering_fields = ['created_at', 'updated_at']
     ordering = ['-updated_at']
+    list_actions = ('list', 'my_games', 'waiting_games', 'active_games')
 
     def get_queryset(self):
         """Get games for current user"""
         user = self.request.user
-        return CaroGame.objects.filter(
+        games = CaroGame.objects.filter(
             Q(player1=user) | Q(player2=user)
         )
+        if self.action in self.list_actions:
+            return CaroGameListSerializer.setup_eager_loading(games)
+        return games.select_related('player1', 'player2', 'winner')
 
     def get_serializer_class(self):
         if self.action == 'create':
             return CaroGameCreateSerializer
+        if self.action in self.list_actions:
+            return CaroGameListSerializer
         return CaroGameSerializer
 
+    def _paginated_list(self, games):
+        """Paginated list response, same shape as ``list``"""
+        page = self.paginate_queryset(games)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = self.get_serializer(games, many=True)
+        return Response(serializer.data)
+
+    def _snapshot_response(self, request, snapshot, cache_control, body=None):
+        """Serve a settled-game snapshot, honouring If-None-Match"""
+        if_none_match = request.headers.get('If-None-Match', '')
+        if snapshot.etag in [tag.strip() for tag in if_none_match.split(',')]:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body or snapshot.body, content_type='application/json')
+        response['ETag'] = snapshot.etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """Game detail; settled games come from their immutable snapshot"""
+        game = self.get_object()
+        if snapshots.is_final(game.status):
+            snapshot = snapshots.get_snapshot('game', game)
+            return self._snapshot_response(request, snapshot, snapshots.IMMUTABLE_CACHE_CONTROL)
+        
+        serializer = self.get_serializer(game)
+        return Response(serializer.data)
+
     def perform_create(self, serializer):
         serializer.save()
 
@@ -49,12 +89,12 @@ class CaroGameViewSet(viewsets.ModelViewSet):
         col = serializer.validated_data['col']
         
         try:
-            result = game.make_move(request.user, row, col)
+            success, message = game.make_game_move(row, col, request.user)
             game_serializer = self.get_serializer(game)
             
             return Response({
                 'game': game_serializer.data,
-                'move_result': result
+                'move_result': {'success': success, 'message': message}
             })
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -88,18 +128,9 @@ class CaroGameViewSet(viewsets.ModelViewSet):
         if request.user not in [game.player1, game.player2]:
             return Response({'error': 'Not a player in this game'}, status=status.HTTP_403_FORBIDDEN)
         
-        if game.status == 'finished':
-            return Response({'error': 'Game is already finished'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        game.status = 'abandoned'
-        # Set winner as the other player if game was in progress
-        if game.status == 'playing':
-            if request.user == game.player1:
-                game.winner = game.player2
-            else:
-                game.winner = game.player1
-        
-        game.save()
+        success, message = game.abandon_game(request.user)
+        if not success:
+            return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = self.get_serializer(game)
         return Response(serializer.data)
@@ -107,26 +138,23 @@ class CaroGameViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_games(self, request):
         """Get current user's games"""
-        games = self.get_queryset()
-        serializer = self.get_serializer(games, many=True)
-        return Response(serializer.data)
+        games = self.filter_queryset(self.get_queryset())
+        return self._paginated_list(games)
 
     @action(detail=False, methods=['get'])
     def waiting_games(self, request):
         """Get games waiting for players"""
-        waiting_games = CaroGame.objects.filter(
-            status='waiting'
-        ).exclude(player1=request.user)
+        waiting_games = CaroGameListSerializer.setup_eager_loading(
+            CaroGame.objects.filter(status='waiting').exclude(player1=request.user)
+        ).order_by('-created_at')
         
-        serializer = self.get_serializer(waiting_games, many=True)
-        return Response(serializer.data)
+        return self._paginated_list(waiting_games)
 
     @action(detail=False, methods=['get'])
     def active_games(self, request):
         """Get user's active games"""
-        active_games = self.get_queryset().filter(status='playing')
-        serializer = self.get_serializer(active_games, many=True)
-        return Response(serializer.data)
+        active_games = self.filter_queryset(self.get_queryset()).filter(status='playing')
+        return self._paginated_list(active_games)
 
     @action(detail=False, methods=['get'], url_path='rooms')
     def rooms(self, request):
@@ -134,12 +162,12 @@ class CaroGameViewSet(viewsets.ModelViewSet):
         # Get waiting rooms (exclude user's own games)
         waiting_games = CaroGame.objects.filter(
             status='waiting'
-        ).exclude(player1=request.user).order_by('-created_at')
+        ).exclude(player1=request.user).select_related('player1', 'player2').order_by('-created_at')
         
         # Get playing rooms
         playing_games = CaroGame.objects.filter(
             status='playing'
-        ).order_by('-updated_at')
+        ).select_related('player1', 'player2').order_by('-updated_at')
         
         # Simplified serialization for list view
         waiting_data = [{
@@ -172,43 +200,44 @@ class CaroGameViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get user's game statistics"""
-        user = request.user
-        games = self.get_queryset()
-        
-        total_games = games.filter(status='finished').count()
-        games_won = games.filter(winner=user, status='finished').count()
-        games_lost = games.filter(status='finished').exclude(
-            Q(winner=user) | Q(winner__isnull=True)
-        ).count()
-        games_drawn = games.filter(winner__isnull=True, status='finished').count()
-        
-        win_rate = (games_won / total_games * 100) if total_games > 0 else 0
-        
-        # Calculate streaks (simplified)
-        recent_games = games.filter(status='finished').order_by('-finished_at')[:10]
-        current_streak = 0
-        for game in recent_games:
-            if game.winner == user:
-                current_streak += 1
-            else:
-                break
-        
-        # For best streak, we'd need more complex logic or a separate field
-        best_streak = current_streak  # Simplified
+        player_stats = PlayerStats.for_user(request.user)
         
         stats_data = {
-            'total_games': total_games,
-            'games_won': games_won,
-            'games_lost': games_lost,
-            'games_drawn': games_drawn,
-            'win_rate': win_rate,
-            'current_streak': current_streak,
-            'best_streak': best_streak,
+            'total_games': player_stats.games_played,
+            'games_won': player_stats.games_won,
+            'games_lost': player_stats.games_lost,
+            'games_drawn': player_stats.games_drawn,
+            'win_rate': player_stats.win_rate,
+            'current_streak': player_stats.current_streak,
+            'best_streak': player_stats.best_streak,
+            'rating': player_stats.rating,
+            'rating_percentile': player_stats.get_rating_percentile() if player_stats.pk else None,
         }
         
         serializer = CaroGameStatsSerializer(stats_data)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """Top players by rating, plus the current user's rank and percentile"""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        
+        top_players = PlayerStats.objects.select_related('user').order_by('-rating', 'user_id')[:limit]
+        player_stats = PlayerStats.for_user(request.user)
+        
+        return Response({
+            'success': True,
+            'leaderboard': PlayerStatsSerializer(top_players, many=True).data,
+            'me': {
+                **PlayerStatsSerializer(player_stats).data,
+                'rank': player_stats.get_rank() if player_stats.pk else None,
+                'rating_percentile': player_stats.get_rating_percentile() if player_stats.pk else None,
+            }
+        })
+
     @action(detail=False, methods=['post'], url_path='create-room')
     def create_room(self, request):
         """Create a new game room"""
@@ -302,59 +331,27 @@ class CaroGameViewSet(viewsets.ModelViewSet):
                 'message': 'room_name is required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            game = CaroGame.objects.get(room_name=room_name)
-        except CaroGame.DoesNotExist:
+        game = CaroGame.objects.filter(room_name=room_name).order_by('-created_at').first()
+        if game is None:
             return Response({
                 'success': False,
                 'message': 'Room not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        if request.user not in [game.player1, game.player2]:
+        if request.user.id not in [game.player1_id, game.player2_id]:
             return Response({
                 'success': False,
                 'message': 'Not a player in this game'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        if game.status == 'finished':
+        # Refund or payout, status and stats are settled together under a row lock
+        success, message = game.abandon_game(request.user)
+        if not success:
             return Response({
                 'success': False,
-                'message': 'Game is already finished'
+                'message': message
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Determine winner (opponent of person who abandoned)
-        from user_wallet.models import Wallet
-        
-        if game.status == 'waiting':
-            # If waiting, just cancel and refund
-            wallet = Wallet.objects.get(user=game.player1)
-            wallet.add_balance(
-                amount=10000,
-                transaction_type='game_refund',
-                description=f'Refund for abandoned Caro game room: {room_name}',
-                game=game
-            )
-            game.status = 'abandoned'
-        else:
-            # If playing, opponent wins
-            if request.user == game.player1:
-                game.winner = game.player2
-            else:
-                game.winner = game.player1
-            
-            # Award prize to winner
-            winner_wallet = Wallet.objects.get(user=game.winner)
-            winner_wallet.add_balance(
-                amount=game.winner_prize,
-                transaction_type='game_win',
-                description=f'Won Caro game (opponent abandoned): {room_name}',
-                game=game
-            )
-            
-            game.status = 'abandoned'
-        
-        game.save()
-        
         game_serializer = CaroGameSerializer(game)
         return Response({
             'success': True,
@@ -362,38 +359,117 @@ class CaroGameViewSet(viewsets.ModelViewSet):
             'game': game_serializer.data
         })
 
-    @action(detail=False, methods=['get'], url_path='room/(?P<room_name>[^/.]+)')
-    def get_room(self, request, room_name=None):
-        """Get game details by room_name"""
+    @action(detail=False, methods=['post'], url_path='quick-match')
+    def quick_match(self, request):
+        """Pair with a waiting opponent at the same bet, or join the queue"""
+        from .matchmaking import quick_match, MatchmakingError
+
+        try:
+            bet_amount = int(request.data.get('bet_amount', 10000))
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'message': 'bet_amount must be an integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            game = CaroGame.objects.get(room_name=room_name)
-            serializer = CaroGameSerializer(game)
+            game = quick_match(request.user, bet_amount)
+        except MatchmakingError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if game is None:
+            # Opponent will be announced with a caro.match_found event
             return Response({
                 'success': True,
-                'game': serializer.data
-            })
-        except CaroGame.DoesNotExist:
+                'status': 'queued',
+                'message': 'Waiting for an opponent'
+            }, status=status.HTTP_202_ACCEPTED)
+
+        game_serializer = CaroGameSerializer(game)
+        return Response({
+            'success': True,
+            'status': 'matched',
+            'message': 'Opponent found',
+            'game': game_serializer.data
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='cancel-match')
+    def cancel_match(self, request):
+        """Leave the quick-match queue"""
+        from .matchmaking import cancel_quick_match
+
+        cancelled = cancel_quick_match(request.user)
+        return Response({
+            'success': True,
+            'cancelled': cancelled
+        })
+
+    @action(detail=False, methods=['get'], url_path='room/(?P<room_name>[^/.]+)')
+    def get_room(self, request, room_name=None):
+        """Get game details by room_name"""
+        game = (
+            CaroGame.objects
+            .filter(room_name=room_name)
+            .select_related('player1', 'player2', 'winner')
+            .order_by('-created_at')
+            .first()
+        )
+        if game is None:
             return Response({
                 'success': False,
                 'message': 'Room not found'
             }, status=status.HTTP_404_NOT_FOUND)
+        
+        if snapshots.is_final(game.status):
+            # Room names are reused, so clients must revalidate
+            snapshot = snapshots.get_snapshot('game', game)
+            body = b'{"success":true,"game":' + snapshot.body + b'}'
+            return self._snapshot_response(request, snapshot, 'private, no-cache', body=body)
+        
+        serializer = CaroGameSerializer(game)
+        return Response({
+            'success': True,
+            'game': serializer.data
+        })
+
+    @action(detail=True, methods=['get'])
+    def replay(self, request, pk=None):
+        """
+        Timed move list of a settled game, open to spectators.
+        
+        Served from the snapshot cache without touching the games table.
+        """
+        if not str(pk).isdigit():
+            return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        snapshot = snapshots.get_cached('replay', pk)
+        if snapshot is None:
+            game = (
+                CaroGame.objects
+                .select_related('player1', 'player2', 'winner')
+                .filter(pk=pk)
+                .first()
+            )
+            if game is None:
+                return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
+            if not snapshots.is_final(game.status):
+                return Response({'error': 'Game is still in progress'}, status=status.HTTP_409_CONFLICT)
+            snapshot = snapshots.get_snapshot('replay', game)
+        
+        return self._snapshot_response(request, snapshot, snapshots.IMMUTABLE_CACHE_CONTROL)
 
     @action(detail=False, methods=['get'], url_path='user-stats')
     def user_stats(self, request):
         """Get user's caro game statistics"""
         user = request.user
         
-        total_games_played = CaroGame.objects.filter(
-            Q(player1=user) | Q(player2=user),
-            status='finished'
-        ).count()
-        
-        total_games_won = CaroGame.objects.filter(
-            winner=user,
-            status='finished'
-        ).count()
-        
-        win_rate = (total_games_won / total_games_played * 100) if total_games_played > 0 else 0
+        player_stats = PlayerStats.for_user(user)
+        total_games_played = player_stats.games_played
+        total_games_won = player_stats.games_won
+        win_rate = player_stats.win_rate
         
         return Response({
             'success': True,
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CaroGameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'caro_game'
+    
+    def ready(self):
+        import caro_game.signals
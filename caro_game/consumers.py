@@ -1,7 +1,7 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth.models import User
-from .models import CaroGame, CaroMove
+from .actors import acquire_actor, release_actor, add_spectator, spectator_group
+from . import lobby
 import json
 import logging
 
@@ -12,7 +12,9 @@ class CaroRoomListConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for Caro room list real-time updates"""
     
     async def connect(self):
-        self.room_group_name = 'caro_room_list'
+        self.room_group_name = lobby.LOBBY_GROUP
+        user = self.scope.get('user')
+        self.username = user.username if user and user.is_authenticated else None
         
         # Join caro room list group
         await self.channel_layer.group_add(
@@ -69,80 +71,111 @@ class CaroRoomListConsumer(AsyncWebsocketConsumer):
             'data': event['data']
         }))
     
+    async def room_added(self, event):
+        """A room entered the lobby"""
+        await self.send_room_delta('room_added', event['data'])
+    
+    async def room_changed(self, event):
+        """A lobby room changed status (e.g. waiting -> playing)"""
+        await self.send_room_delta('room_changed', event['data'])
+    
+    async def room_removed(self, event):
+        """A room left the lobby (finished or abandoned)"""
+        await self.send_room_delta('room_removed', event['data'])
+    
+    async def send_room_delta(self, delta_type, room):
+        """Forward a lobby delta unless it is this user's own waiting room"""
+        if 'status' in room and not lobby.is_visible_to(room, self.username):
+            return
+        await self.send(text_data=json.dumps({
+            'type': delta_type,
+            'data': room
+        }))
+    
     @database_sync_to_async
     def get_rooms_list(self):
-        """Get list of waiting and playing rooms"""
-        user = self.scope.get('user')
+        """Get list of waiting and playing rooms from the lobby index"""
+        return lobby.get_rooms(lobby.get_index(), username=self.username)
+
+
+class CaroGameConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for individual Caro game real-time updates
+    
+    The two players join ``caro_game_<room>`` and get every move; anyone
+    else is a spectator in ``caro_watch_<room>`` and gets merged updates.
+    """
+    
+    async def connect(self):
+        self.room_name = self.scope['url_route']['kwargs']['room_name']
+        self.player_group_name = f'caro_game_{self.room_name}'
+        self.room_group_name = None
         
-        # Get waiting rooms (exclude user's own games if authenticated)
-        waiting_query = CaroGame.objects.filter(status='waiting').order_by('-created_at')
-        if user and user.is_authenticated:
-            waiting_query = waiting_query.exclude(player1=user)
+        user = self.scope.get('user')
+        self.username = user.username if user and user.is_authenticated else None
         
-        waiting_games = waiting_query[:20]  # Limit to 20
+        # All sockets of the room share one actor that owns the game state
+        self.actor = acquire_actor(self.room_name)
         
-        # Get playing rooms
-        playing_games = CaroGame.objects.filter(
-            status='playing'
-        ).order_by('-updated_at')[:20]  # Limit to 20
+        await self.accept()
         
-        waiting_data = [{
-            'id': game.id,
-            'game_id': game.game_id,
-            'room_name': game.room_name,
-            'player1': game.player1.username,
-            'player2': game.player2.username if game.player2 else None,
-            'status': game.status,
-            'bet_amount': game.bet_amount,
-            'created_at': game.created_at.isoformat(),
-        } for game in waiting_games]
+        # The loaded game decides the role; the snapshot is re-read after
+        # joining the group so no move falls in between
+        await self.actor.get_snapshot()
+        await self.join_role_group()
         
-        playing_data = [{
-            'id': game.id,
-            'game_id': game.game_id,
-            'room_name': game.room_name,
-            'player1': game.player1.username,
-            'player2': game.player2.username if game.player2 else None,
-            'status': game.status,
-            'bet_amount': game.bet_amount,
-            'created_at': game.created_at.isoformat(),
-        } for game in playing_games]
+        # Send the full game state once; later updates are deltas
+        snapshot = await self.actor.get_snapshot()
+        if snapshot:
+            await self.send(text_data=snapshot)
+    
+    async def disconnect(self, close_code):
+        if self.room_group_name:
+            await self.leave_role_group()
         
-        return {
-            'waiting': waiting_data,
-            'playing': playing_data
-        }
-
-
-class CaroGameConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for individual Caro game real-time updates"""
+        if getattr(self, 'actor', None) is not None:
+            await release_actor(self.room_name)
+            self.actor = None
     
-    async def connect(self):
-        self.room_name = self.scope['url_route']['kwargs']['room_name']
-        self.room_group_name = f'caro_game_{self.room_name}'
+    @property
+    def is_spectator(self):
+        return self.room_group_name != self.player_group_name
+    
+    @database_sync_to_async
+    def has_joined(self):
+        """Whether this spectator has since become a player of the room's game (one indexed lookup)"""
+        from .models import CaroGame
+        if not self.username:
+            return False
+        return CaroGame.objects.filter(
+            room_name=self.room_name,
+            status__in=['waiting', 'playing'],
+            player2_id=self.scope['user'].id
+        ).exists()
+    
+    async def join_role_group(self):
+        """Join the player or spectator group, whichever this user belongs to"""
+        if self.actor.is_player(self.username):
+            self.room_group_name = self.player_group_name
+        else:
+            self.room_group_name = spectator_group(self.room_name)
+            await add_spectator(self.room_name)
+            self.actor.spectators_changed()
         
-        # Join game room group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
-        
-        await self.accept()
-        
-        # Send current game state on connect
-        game_data = await self.get_game_state()
-        if game_data:
-            await self.send(text_data=json.dumps({
-                'type': 'game_state',
-                'data': game_data
-            }))
     
-    async def disconnect(self, close_code):
-        # Leave game room group
+    async def leave_role_group(self):
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
+        if self.is_spectator:
+            await add_spectator(self.room_name, -1)
+            self.actor.spectators_changed()
+        self.room_group_name = None
     
     async def receive(self, text_data):
         """Handle messages from WebSocket"""
@@ -150,25 +183,30 @@ class CaroGameConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             message_type = data.get('type')
             
-            if message_type == 'make_move':
+            if message_type == 'make_move' and self.is_spectator:
+                await self.send(text_data=json.dumps({
+                    'type': 'error',
+                    'message': 'Spectators cannot make moves'
+                }))
+            
+            elif message_type == 'make_move':
                 # Handle move request
                 row = data.get('row')
                 col = data.get('col')
                 
-                result = await self.handle_move(row, col)
+                result = await self.actor.submit_move(self.scope.get('user'), row, col)
                 
                 if result['success']:
-                    # Broadcast move to all players in game room
+                    # Broadcast only the new move to the players; spectators
+                    # get it merged into the next throttled update
                     await self.channel_layer.group_send(
-                        self.room_group_name,
+                        self.player_group_name,
                         {
-                            'type': 'game_state',
-                            'data': result['game_data']
+                            'type': 'game_move',
+                            'data': result['event']
                         }
                     )
-                    
-                    # Also notify room list that game state changed
-                    await self.notify_room_list_update()
+                    self.actor.queue_spectator_event(result['event'])
                 else:
                     # Send error only to this player
                     await self.send(text_data=json.dumps({
@@ -176,14 +214,37 @@ class CaroGameConsumer(AsyncWebsocketConsumer):
                         'message': result['message']
                     }))
             
-            elif message_type == 'refresh_game':
-                # Client requests game state refresh
-                game_data = await self.get_game_state()
-                if game_data:
+            elif message_type == 'sync':
+                # Client reports the last seq it applied; resend the full
+                # state only when it missed a move
+                last_seq = data.get('last_seq')
+                if last_seq == self.actor.seq:
                     await self.send(text_data=json.dumps({
-                        'type': 'game_state',
-                        'data': game_data
+                        'type': 'in_sync',
+                        'seq': last_seq
                     }))
+                else:
+                    snapshot = await self.actor.get_snapshot()
+                    if snapshot:
+                        await self.send(text_data=snapshot)
+            
+            elif message_type == 'refresh_game':
+                # Client requests game state refresh (e.g. after joining via REST)
+                if self.is_spectator and not await self.has_joined():
+                    # Watchers get the cached snapshot, only a reload re-reads the game
+                    snapshot = await self.actor.get_snapshot()
+                    if snapshot:
+                        await self.send(text_data=snapshot)
+                    return
+                
+                snapshot = await self.actor.refresh()
+                if self.is_spectator and self.actor.is_player(self.username):
+                    # Joined the game: move over to the player group
+                    await self.leave_role_group()
+                    await self.join_role_group()
+                self.actor.queue_spectator_event()
+                if snapshot:
+                    await self.send(text_data=snapshot)
         
         except Exception as e:
             logger.error(f"Error in CaroGameConsumer.receive: {str(e)}")
@@ -199,172 +260,38 @@ class CaroGameConsumer(AsyncWebsocketConsumer):
             'data': event['data']
         }))
     
-    @database_sync_to_async
-    def get_game_state(self):
-        """Get current game state"""
-        try:
-            game = CaroGame.objects.get(room_name=self.room_name)
-            
-            # Get all moves
-            moves = game.moves.all().order_by('move_number')
-            moves_data = [{
-                'row': move.row,
-                'col': move.col,
-                'symbol': move.symbol,
-                'move_number': move.move_number,
-                'player_username': move.player.username,
-                'timestamp': move.timestamp.isoformat(),
-            } for move in moves]
-            
-            return {
-                'id': game.id,
-                'game_id': game.game_id,
-                'room_name': game.room_name,
-                'player1': {
-                    'username': game.player1.username,
-                    'display_name': game.player1.first_name or game.player1.username,
-                },
-                'player2': {
-                    'username': game.player2.username,
-                    'display_name': game.player2.first_name or game.player2.username,
-                } if game.player2 else None,
-                'current_turn': game.current_turn,
-                'status': game.status,
-                'winner': {
-                    'username': game.winner.username,
-                    'display_name': game.winner.first_name or game.winner.username,
-                } if game.winner else None,
-                'total_moves': game.total_moves,
-                'moves': moves_data,
-                'bet_amount': game.bet_amount,
-                'total_pot': game.total_pot,
-                'winner_prize': game.winner_prize,
-                'house_fee': game.house_fee,
-            }
-        except CaroGame.DoesNotExist:
-            return None
+    async def game_reload(self, event):
+        """The game row changed outside the actor (e.g. turn timeout): resend full state"""
+        if self.is_spectator:
+            # One reload per actor, sent to all spectators by the next flush
+            self.actor.queue_spectator_event(reload=True)
+            return
+        # The room's sockets share the actor: only the first of them reloads
+        snapshot = await self.actor.reload(event.get('version'))
+        if snapshot:
+            await self.send(text_data=snapshot)
     
-    @database_sync_to_async
-    def handle_move(self, row, col):
-        """Handle player move"""
-        try:
-            user = self.scope.get('user')
-            if not user or not user.is_authenticated:
-                return {'success': False, 'message': 'Not authenticated'}
-            
-            game = CaroGame.objects.get(room_name=self.room_name)
-            
-            # Validate it's player's turn
-            if game.current_turn == 'X' and user != game.player1:
-                return {'success': False, 'message': 'Not your turn'}
-            if game.current_turn == 'O' and user != game.player2:
-                return {'success': False, 'message': 'Not your turn'}
-            
-            # Make the move
-            result = game.make_game_move(user, row, col)
-            
-            # Get updated game state
-            moves = game.moves.all().order_by('move_number')
-            moves_data = [{
-                'row': move.row,
-                'col': move.col,
-                'symbol': move.symbol,
-                'move_number': move.move_number,
-                'player_username': move.player.username,
-                'timestamp': move.timestamp.isoformat(),
-            } for move in moves]
-            
-            game_data = {
-                'id': game.id,
-                'game_id': game.game_id,
-                'room_name': game.room_name,
-                'player1': {
-                    'username': game.player1.username,
-                    'display_name': game.player1.first_name or game.player1.username,
-                },
-                'player2': {
-                    'username': game.player2.username,
-                    'display_name': game.player2.first_name or game.player2.username,
-                } if game.player2 else None,
-                'current_turn': game.current_turn,
-                'status': game.status,
-                'winner': {
-                    'username': game.winner.username,
-                    'display_name': game.winner.first_name or game.winner.username,
-                } if game.winner else None,
-                'total_moves': game.total_moves,
-                'moves': moves_data,
-                'bet_amount': game.bet_amount,
-                'total_pot': game.total_pot,
-                'winner_prize': game.winner_prize,
-                'house_fee': game.house_fee,
-            }
-            
-            return {
-                'success': True,
-                'message': result['message'],
-                'game_data': game_data
-            }
-            
-        except CaroGame.DoesNotExist:
-            return {'success': False, 'message': 'Game not found'}
-        except Exception as e:
-            logger.error(f"Error in handle_move: {str(e)}")
-            return {'success': False, 'message': str(e)}
+    async def game_move(self, event):
+        """Receive a game_move delta (seq, move, turn, status) and send to WebSocket"""
+        await self.send(text_data=json.dumps({
+            'type': 'game_move',
+            'data': event['data']
+        }))
     
-    async def notify_room_list_update(self):
-        """Notify room list consumers that rooms have updated"""
-        from channels.layers import get_channel_layer
-        channel_layer = get_channel_layer()
-        
-        # Get updated rooms list
-        rooms_data = await self.get_rooms_list()
-        
-        # Broadcast to room list group
-        await channel_layer.group_send(
-            'caro_room_list',
-            {
-                'type': 'rooms_update',
-                'data': rooms_data
-            }
-        )
+    async def spectator_update(self, event):
+        """Merged moves since the last spectator update, plus the spectator count"""
+        await self.send(text_data=json.dumps({
+            'type': 'spectator_update',
+            'data': event['data']
+        }))
     
-    @database_sync_to_async
-    def get_rooms_list(self):
-        """Get list of waiting and playing rooms"""
-        # Get waiting rooms
-        waiting_games = CaroGame.objects.filter(
-            status='waiting'
-        ).order_by('-created_at')[:20]
-        
-        # Get playing rooms
-        playing_games = CaroGame.objects.filter(
-            status='playing'
-        ).order_by('-updated_at')[:20]
-        
-        waiting_data = [{
-            'id': game.id,
-            'game_id': game.game_id,
-            'room_name': game.room_name,
-            'player1': game.player1.username,
-            'player2': game.player2.username if game.player2 else None,
-            'status': game.status,
-            'bet_amount': game.bet_amount,
-            'created_at': game.created_at.isoformat(),
-        } for game in waiting_games]
-        
-        playing_data = [{
-            'id': game.id,
-            'game_id': game.game_id,
-            'room_name': game.room_name,
-            'player1': game.player1.username,
-            'player2': game.player2.username if game.player2 else None,
-            'status': game.status,
-            'bet_amount': game.bet_amount,
-            'created_at': game.created_at.isoformat(),
-        } for game in playing_games]
-        
-        return {
-            'waiting': waiting_data,
-            'playing': playing_data
-        }
+    async def spectator_state(self, event):
+        """Full state for spectators after the game was reloaded"""
+        await self.send(text_data=event['snapshot'])
+    
+    async def spectator_count(self, event):
+        """Players see how many people are watching"""
+        await self.send(text_data=json.dumps({
+            'type': 'spectator_count',
+            'spectators': event['spectators']
+        }))
@@ -0,0 +1,151 @@
+"""
+In-memory Caro board engine
+
+Each live game keeps one compact board in process memory (a flat
+bytearray, one byte per cell), rebuilt lazily from the game's move log.
+Occupancy checks are a single index lookup and win detection only scans
+the four lines through the last stone, so validating and applying a move
+costs O(win_condition) with no database reads.
+"""
+import threading
+from collections import OrderedDict
+
+BOARD_SIZE = 15
+MAX_CACHED_BOARDS = 2000
+
+EMPTY = 0
+SYMBOL_CODES = {'X': 1, 'O': 2}
+CODE_SYMBOLS = {code: symbol for symbol, code in SYMBOL_CODES.items()}
+
+# horizontal, vertical, diagonal, anti-diagonal
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class CaroBoard:
+    """Compact Caro board with incremental win detection"""
+
+    __slots__ = ('size', 'win_condition', 'cells', 'move_count', 'last_move', 'winner')
+
+    def __init__(self, size=BOARD_SIZE, win_condition=5):
+        self.size = size
+        self.win_condition = win_condition
+        self.cells = bytearray(size * size)
+        self.move_count = 0
+        self.last_move = None
+        self.winner = None
+
+    @classmethod
+    def from_moves(cls, moves, size=BOARD_SIZE, win_condition=5):
+        """Rebuild a board from ordered (row, col, symbol) tuples"""
+        board = cls(size=size, win_condition=win_condition)
+        for row, col, symbol in moves:
+            board.place(row, col, symbol)
+        return board
+
+    def in_bounds(self, row, col):
+        """Check that a position lies on the board"""
+        return (
+            isinstance(row, int) and isinstance(col, int) and
+            0 <= row < self.size and 0 <= col < self.size
+        )
+
+    def is_empty(self, row, col):
+        """Check that a position is on the board and not taken"""
+        return self.in_bounds(row, col) and self.cells[row * self.size + col] == EMPTY
+
+    def symbol_at(self, row, col):
+        """Get 'X', 'O' or None for a position"""
+        return CODE_SYMBOLS.get(self.cells[row * self.size + col])
+
+    def is_full(self):
+        """Check if no empty cell is left"""
+        return self.move_count >= self.size * self.size
+
+    def place(self, row, col, symbol):
+        """
+        Put a stone on the board.
+
+        Returns True when the stone completes a line of win_condition.
+        Raises ValueError for positions that are off the board or taken.
+        """
+        if not self.is_empty(row, col):
+            raise ValueError("Invalid move position")
+
+        self.cells[row * self.size + col] = SYMBOL_CODES[symbol]
+        self.move_count += 1
+        self.last_move = (row, col)
+
+        if self.winner is None and self.is_winning_move(row, col):
+            self.winner = symbol
+            return True
+        return False
+
+    def is_winning_move(self, row, col):
+        """Check only the four lines passing through (row, col)"""
+        size = self.size
+        cells = self.cells
+        code = cells[row * size + col]
+        if code == EMPTY:
+            return False
+
+        reach = self.win_condition - 1
+        for dr, dc in DIRECTIONS:
+            count = 1
+
+            # Forward direction
+            r, c = row + dr, col + dc
+            steps = 0
+            while steps < reach and 0 <= r < size and 0 <= c < size and cells[r * size + c] == code:
+                count += 1
+                steps += 1
+                r, c = r + dr, c + dc
+
+            # Backward direction
+            r, c = row - dr, col - dc
+            steps = 0
+            while steps < reach and 0 <= r < size and 0 <= c < size and cells[r * size + c] == code:
+                count += 1
+                steps += 1
+                r, c = r - dr, c - dc
+
+            if count >= self.win_condition:
+                return True
+
+        return False
+
+
+# ===========================
+# LIVE BOARD REGISTRY
+# ===========================
+_boards = OrderedDict()
+_boards_lock = threading.Lock()
+
+
+def get_board(game):
+    """
+    Get the in-memory board for a game, rebuilding it from the move log
+    when missing or out of date (e.g. moves written by another worker).
+    """
+    with _boards_lock:
+        board = _boards.get(game.pk)
+        if board is not None and board.move_count == game.total_moves:
+            _boards.move_to_end(game.pk)
+            return board
+
+    from .movelog import decode
+    moves = [(row, col, symbol) for row, col, symbol, _, _ in decode(game.get_move_log())]
+    board = CaroBoard.from_moves(moves, win_condition=game.win_condition)
+
+    with _boards_lock:
+        _boards[game.pk] = board
+        _boards.move_to_end(game.pk)
+        while len(_boards) > MAX_CACHED_BOARDS:
+            _boards.popitem(last=False)
+
+    return board
+
+
+def discard_board(game_pk):
+    """Drop a board once its game is over"""
+    with _boards_lock:
+        _boards.pop(game_pk, None)
@@ -0,0 +1,154 @@
+"""
+Caro lobby index
+
+The lobby (waiting and playing rooms) is kept as one dict in the cache,
+``{game pk: room entry}``. It only changes when a game is created,
+joined, finished, abandoned or deleted, never on moves. Each change is
+applied to the index after commit and pushed to ``caro_room_list`` as a
+``room_added`` / ``room_changed`` / ``room_removed`` delta, so lobby
+sockets never re-query the database.
+"""
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+LOBBY_GROUP = 'caro_room_list'
+LOBBY_INDEX_KEY = 'caro_lobby_index'
+LOBBY_LOCK_KEY = 'caro_lobby_index_lock'
+LOBBY_INDEX_TIMEOUT = 600  # a missed update heals at the next rebuild
+LOBBY_STATUSES = ('waiting', 'playing')
+LOBBY_PAGE_SIZE = 20
+LOCK_RETRIES = 50
+
+
+def room_entry(game):
+    """Lobby representation of a game"""
+    return {
+        'id': game.id,
+        'game_id': game.game_id,
+        'room_name': game.room_name,
+        'player1': game.player1.username,
+        'player2': game.player2.username if game.player2 else None,
+        'status': game.status,
+        'bet_amount': game.bet_amount,
+        'created_at': game.created_at.isoformat(),
+        'started_at': game.started_at.isoformat() if game.started_at else None,
+    }
+
+
+def get_index():
+    """Get the lobby index, rebuilding it from the database when missing"""
+    index = cache.get(LOBBY_INDEX_KEY)
+    if index is None:
+        index = rebuild_index()
+    return index
+
+
+def rebuild_index():
+    """Load all waiting/playing games into the cache with one query"""
+    from .models import CaroGame
+
+    games = (
+        CaroGame.objects
+        .filter(status__in=LOBBY_STATUSES)
+        .select_related('player1', 'player2')
+    )
+    index = {game.id: room_entry(game) for game in games}
+    cache.set(LOBBY_INDEX_KEY, index, timeout=LOBBY_INDEX_TIMEOUT)
+    return index
+
+
+def get_rooms(index, username=None, limit=LOBBY_PAGE_SIZE):
+    """
+    Lobby lists for one viewer.
+
+    Waiting rooms created by ``username`` are left out (you can't join
+    your own room); the filtering is done here, in memory.
+    """
+    waiting = sorted(
+        (room for room in index.values()
+         if room['status'] == 'waiting' and room['player1'] != username),
+        key=lambda room: room['created_at'],
+        reverse=True
+    )
+    playing = sorted(
+        (room for room in index.values() if room['status'] == 'playing'),
+        key=lambda room: room['started_at'] or room['created_at'],
+        reverse=True
+    )
+    return {
+        'waiting': waiting[:limit],
+        'playing': playing[:limit],
+    }
+
+
+def is_visible_to(room, username):
+    """Whether a room delta should reach a lobby socket of ``username``"""
+    return not (room['status'] == 'waiting' and room['player1'] == username)
+
+
+def game_changed(game, created, previous_status):
+    """Turn a saved game into a lobby delta, published after commit"""
+    if created:
+        if game.status not in LOBBY_STATUSES:
+            return
+        event, room = 'room_added', room_entry(game)
+    elif game.status == previous_status:
+        return  # moves and counters don't affect the lobby
+    elif game.status in LOBBY_STATUSES:
+        event, room = 'room_changed', room_entry(game)
+    else:
+        event, room = 'room_removed', {'id': game.id, 'room_name': game.room_name}
+
+    # The entry is captured now; index and sockets only see it once committed
+    transaction.on_commit(lambda: publish(event, room))
+
+
+def game_deleted(game):
+    """A deleted game leaves the lobby like a finished one"""
+    if game.status not in LOBBY_STATUSES:
+        return
+    room = {'id': game.id, 'room_name': game.room_name}
+    transaction.on_commit(lambda: publish('room_removed', room))
+
+
+def publish(event, room):
+    """Apply a delta to the index and send it to lobby sockets"""
+    _update_index(event, room)
+
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            LOBBY_GROUP,
+            {'type': event, 'data': room}
+        )
+    except Exception as e:
+        logger.error(f"Error sending lobby {event}: {e}")
+
+
+def _update_index(event, room):
+    """Apply one delta to the cached index under a short cache lock"""
+    for _ in range(LOCK_RETRIES):
+        if cache.add(LOBBY_LOCK_KEY, True, timeout=5):
+            try:
+                index = cache.get(LOBBY_INDEX_KEY)
+                if index is None:
+                    return  # next reader rebuilds it from the database
+                if event == 'room_removed':
+                    index.pop(room['id'], None)
+                else:
+                    index[room['id']] = room
+                cache.set(LOBBY_INDEX_KEY, index, timeout=LOBBY_INDEX_TIMEOUT)
+            finally:
+                cache.delete(LOBBY_LOCK_KEY)
+            return
+        time.sleep(0.01)
+
+    # Lock contention: drop the index rather than risk losing this update
+    logger.warning("Lobby index lock busy, invalidating index")
+    cache.delete(LOBBY_INDEX_KEY)
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from caro_game.models import PlayerStats
+from caro_game.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild PlayerStats from all finished (or won by abandon) Caro games'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows fetched per chunk and written per bulk query (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        started = timezone.now()
+        games = (
+            PlayerStats.rated_games()
+            .order_by('finished_at', 'id')
+            .values_list('player1_id', 'player2_id', 'winner_id', 'winner_prize', 'finished_at')
+        )
+
+        # Replay games in finishing order so streaks come out right
+        totals = {}
+        results = []
+        for player1_id, player2_id, winner_id, winner_prize, finished_at in games.iterator(chunk_size=batch_size):
+            results.append((player1_id, player2_id, winner_id))
+            for user_id in (player1_id, player2_id):
+                stats = totals.get(user_id)
+                if stats is None:
+                    stats = totals[user_id] = PlayerStats(user_id=user_id)
+
+                stats.games_played += 1
+                stats.last_game_at = finished_at
+                if winner_id is None:
+                    stats.games_drawn += 1
+                    stats.current_streak = 0
+                elif winner_id == user_id:
+                    stats.games_won += 1
+                    stats.current_streak += 1
+                    stats.best_streak = max(stats.best_streak, stats.current_streak)
+                    stats.total_winnings += winner_prize
+                else:
+                    stats.games_lost += 1
+                    stats.current_streak = 0
+
+        for user_id, rating in recompute_ratings(results).items():
+            totals[user_id].rating = rating
+
+        with transaction.atomic():
+            # Rows a game settled during the replay are already newer than it: leave them
+            changed = {
+                user_id
+                for user_id, updated_at in PlayerStats.objects.select_for_update().values_list('user_id', 'updated_at')
+                if updated_at > started
+            }
+            PlayerStats.objects.exclude(user_id__in=changed).delete()
+            rebuilt = [stats for user_id, stats in totals.items() if user_id not in changed]
+            # ignore_conflicts: a first game settled after the lock may have created the row
+            PlayerStats.objects.bulk_create(rebuilt, batch_size=batch_size, ignore_conflicts=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rebuilt stats for {len(rebuilt)} players ({len(changed)} changed during the replay, skipped)"
+        ))
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+
+from caro_game import movelog
+from caro_game.models import CaroGame, CaroMove
+
+
+class Command(BaseCommand):
+    help = 'Pack CaroMove rows of existing games into CaroGame.move_log'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of games written per UPDATE (default: 500)'
+        )
+        parser.add_argument(
+            '--delete-rows',
+            action='store_true',
+            help='Delete the CaroMove rows of finished/abandoned games once their log is complete'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        games = (
+            CaroGame.objects
+            .filter(total_moves__gt=0)
+            .only('id', 'total_moves', 'move_log', 'status')
+            .order_by('id')
+        )
+
+        compacted = 0
+        batch = []
+        for game in games.iterator(chunk_size=batch_size):
+            if movelog.move_count(game.move_log) == game.total_moves:
+                continue
+            game.move_log = game.get_move_log()
+            batch.append(game)
+            if len(batch) >= batch_size:
+                compacted += self.write_batch(batch, batch_size)
+                batch = []
+        if batch:
+            compacted += self.write_batch(batch, batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Compacted move logs of {compacted} games"))
+
+        if options['delete_rows']:
+            deleted = self.delete_rows(batch_size)
+            self.stdout.write(self.style.SUCCESS(f"🗑️ Deleted {deleted} CaroMove rows"))
+
+    def write_batch(self, games, batch_size):
+        """Store the packed logs of one batch with a single UPDATE"""
+        complete = [game for game in games if movelog.move_count(game.move_log) == game.total_moves]
+        skipped = len(games) - len(complete)
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"⚠️ Skipped {skipped} games with missing CaroMove rows"))
+
+        CaroGame.objects.bulk_update(complete, ['move_log'], batch_size=batch_size)
+        return len(complete)
+
+    def delete_rows(self, batch_size):
+        """Drop per-move rows that are fully covered by a packed log"""
+        games = (
+            CaroGame.objects
+            .filter(status__in=['finished', 'abandoned'], total_moves__gt=0)
+            .only('id', 'total_moves', 'move_log')
+            .order_by('id')
+        )
+
+        deleted = 0
+        batch = []
+        for game in games.iterator(chunk_size=batch_size):
+            if movelog.move_count(game.move_log) == game.total_moves:
+                batch.append(game.id)
+            if len(batch) >= batch_size:
+                deleted += CaroMove.objects.filter(game_id__in=batch).delete()[0]
+                batch = []
+        if batch:
+            deleted += CaroMove.objects.filter(game_id__in=batch).delete()[0]
+        return deleted
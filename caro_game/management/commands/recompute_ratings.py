@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from caro_game import ratings
+from caro_game.models import PlayerStats
+
+
+class Command(BaseCommand):
+    help = 'Replay every rated Caro game and rewrite PlayerStats.rating'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--k-factor',
+            type=float,
+            default=ratings.K_FACTOR,
+            help=f'Elo K-factor used for the replay (default: {ratings.K_FACTOR})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows fetched per chunk and written per bulk query (default: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute ratings and print the top players without saving'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        started = timezone.now()
+        games = (
+            PlayerStats.rated_games()
+            .order_by('finished_at', 'id')
+            .values_list('player1_id', 'player2_id', 'winner_id')
+        )
+        new_ratings = ratings.recompute_ratings(
+            games.iterator(chunk_size=batch_size), k_factor=options['k_factor']
+        )
+        backend = 'numpy' if ratings.np is not None else 'python'
+        self.stdout.write(f"Replayed ratings for {len(new_ratings)} players ({backend})")
+
+        if options['dry_run']:
+            top = sorted(new_ratings.items(), key=lambda item: -item[1])[:10]
+            for user_id, rating in top:
+                self.stdout.write(f"  user {user_id}: {rating:.1f}")
+            return
+
+        with transaction.atomic():
+            # Rows a game settled during the replay are already newer than it: leave them
+            stats = list(
+                PlayerStats.objects
+                .select_for_update()
+                .filter(updated_at__lte=started)
+                .only('id', 'user_id', 'rating')
+            )
+            for row in stats:
+                row.rating = new_ratings.get(row.user_id, ratings.BASE_RATING)
+            PlayerStats.objects.bulk_update(stats, ['rating'], batch_size=batch_size)
+            skipped = PlayerStats.objects.filter(updated_at__gt=started).count()
+
+        ratings.build_histogram()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Updated ratings for {len(stats)} players ({skipped} changed during the replay, skipped)"
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from caro_game import timers
+
+
+class Command(BaseCommand):
+    help = 'Run Caro turn clocks (forfeits) and waiting-room expiry (refunds)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sync-interval',
+            type=int,
+            default=timers.SYNC_INTERVAL,
+            help=f'Seconds between syncs with the game table (default: {timers.SYNC_INTERVAL})'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Rehydrate, fire everything already due and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            scheduler = timers.TimerScheduler()
+            timers.sync_games(scheduler)
+            fired = scheduler.run_pending()
+            self.stdout.write(self.style.SUCCESS(f"✅ Fired {fired} of {fired + len(scheduler)} Caro timers"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"⏱️ Caro timers running (turn {timers.TURN_TIMEOUT}s, waiting {timers.WAITING_TIMEOUT}s)"
+        ))
+        timers.run(sync_interval=options['sync_interval'])
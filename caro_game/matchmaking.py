@@ -0,0 +1,264 @@
+"""
+Quick-match queue for Caro
+
+Players waiting for an opponent sit in one FIFO bucket per bet amount.
+Enqueueing either pairs the player with the oldest compatible ticket or
+queues them, in one atomic step, so two players can never grab the same
+opponent. A pair becomes a ``playing`` CaroGame with both bets charged in
+the same transaction, and both players are told over RealtimeConsumer.
+
+Two backends:
+    MemoryMatchQueue  single process (development, tests)
+    RedisMatchQueue   shared by all workers, pairing done in a Lua script
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MATCHMAKING_BETS = getattr(settings, 'CARO_MATCHMAKING_BETS', (10000,))
+TICKET_TTL = getattr(settings, 'CARO_MATCHMAKING_TICKET_TTL', 120)
+
+
+class MatchmakingError(Exception):
+    """A quick-match request that cannot be served (bad bet, no money...)"""
+
+
+class OpponentUnavailable(MatchmakingError):
+    """The paired waiting player can no longer cover the bet"""
+
+
+# ===========================
+# QUEUE BACKENDS
+# ===========================
+class MemoryMatchQueue:
+    """Per-process queue: one OrderedDict per bucket, guarded by a lock"""
+
+    def __init__(self, ticket_ttl=TICKET_TTL):
+        self.ticket_ttl = ticket_ttl
+        self.buckets = {}   # bet -> OrderedDict(user_id -> enqueued_at)
+        self.tickets = {}   # user_id -> bet
+        self.lock = threading.Lock()
+
+    def enqueue(self, user_id, bet):
+        """Pair with the oldest live ticket in the bucket, or queue. Returns the opponent id or None"""
+        now = time.time()
+        with self.lock:
+            if self.tickets.get(user_id) == bet:
+                # Already waiting: just refresh the ticket
+                self.buckets[bet][user_id] = now
+                return None
+            self._remove(user_id)
+
+            bucket = self.buckets.setdefault(bet, OrderedDict())
+            while bucket:
+                other_id, enqueued_at = bucket.popitem(last=False)
+                del self.tickets[other_id]
+                if now - enqueued_at < self.ticket_ttl:
+                    return other_id
+
+            bucket[user_id] = now
+            self.tickets[user_id] = bet
+            return None
+
+    def cancel(self, user_id):
+        """Leave the queue; True if a ticket was removed"""
+        with self.lock:
+            return self._remove(user_id)
+
+    def requeue(self, user_id, bet):
+        """Put a player back at the head of their bucket (pairing fell through)"""
+        with self.lock:
+            self._remove(user_id)
+            bucket = self.buckets.setdefault(bet, OrderedDict())
+            bucket[user_id] = time.time()
+            bucket.move_to_end(user_id, last=False)
+            self.tickets[user_id] = bet
+
+    def _remove(self, user_id):
+        bet = self.tickets.pop(user_id, None)
+        if bet is None:
+            return False
+        self.buckets[bet].pop(user_id, None)
+        return True
+
+
+class RedisMatchQueue:
+    """
+    Queue shared through Redis.
+
+    Each bucket is a list of user ids; ``caro_mm_ticket_{id}`` holds the
+    bet the user is waiting for. Cancelling only deletes the ticket, and
+    list entries without a matching ticket are skipped when popped, so
+    every operation stays O(1) amortized.
+    """
+
+    ENQUEUE_SCRIPT = """
+    local prefix, user_id, bet, ttl = ARGV[1], ARGV[2], ARGV[3], tonumber(ARGV[4])
+    if redis.call('GET', prefix .. user_id) == bet then
+        redis.call('EXPIRE', prefix .. user_id, ttl)
+        return nil
+    end
+    while true do
+        local other = redis.call('LPOP', KEYS[1])
+        if not other then break end
+        if other ~= user_id and redis.call('GET', prefix .. other) == bet then
+            redis.call('DEL', prefix .. other)
+            return other
+        end
+    end
+    redis.call('RPUSH', KEYS[1], user_id)
+    redis.call('SET', prefix .. user_id, bet, 'EX', ttl)
+    return nil
+    """
+
+    TICKET_PREFIX = 'caro_mm_ticket_'
+
+    def __init__(self, ticket_ttl=TICKET_TTL):
+        from django_redis import get_redis_connection
+        self.ticket_ttl = ticket_ttl
+        self.redis = get_redis_connection('default')
+        self.enqueue_script = self.redis.register_script(self.ENQUEUE_SCRIPT)
+
+    def bucket_key(self, bet):
+        return f"caro_mm_bucket_{bet}"
+
+    def enqueue(self, user_id, bet):
+        """Pair with the oldest live ticket in the bucket, or queue. Returns the opponent id or None"""
+        other = self.enqueue_script(
+            keys=[self.bucket_key(bet)],
+            args=[self.TICKET_PREFIX, user_id, bet, self.ticket_ttl]
+        )
+        return int(other) if other is not None else None
+
+    def cancel(self, user_id):
+        """Leave the queue; True if a ticket was removed"""
+        return bool(self.redis.delete(f"{self.TICKET_PREFIX}{user_id}"))
+
+    def requeue(self, user_id, bet):
+        """Put a player back at the head of their bucket (pairing fell through)"""
+        pipe = self.redis.pipeline()
+        pipe.set(f"{self.TICKET_PREFIX}{user_id}", bet, ex=self.ticket_ttl)
+        pipe.lpush(self.bucket_key(bet), user_id)
+        pipe.execute()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Get the configured queue backend (CARO_MATCHMAKING_BACKEND)"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            backend = getattr(settings, 'CARO_MATCHMAKING_BACKEND', 'memory')
+            _queue = RedisMatchQueue() if backend == 'redis' else MemoryMatchQueue()
+    return _queue
+
+
+# ===========================
+# PAIRING
+# ===========================
+def quick_match(user, bet_amount):
+    """
+    Find an opponent for ``user`` at ``bet_amount``.
+
+    Returns the new CaroGame when paired, or None when the user is now
+    waiting in the queue.
+    """
+    if bet_amount not in MATCHMAKING_BETS:
+        raise MatchmakingError(f"Bet must be one of {', '.join(str(bet) for bet in MATCHMAKING_BETS)}")
+
+    from user_wallet.models import Wallet
+    balance = Wallet.objects.filter(user=user).values_list('balance', flat=True).first()
+    if balance is None:
+        raise MatchmakingError("Wallet not found")
+    if balance < bet_amount:
+        raise MatchmakingError("Insufficient balance")
+
+    queue = get_queue()
+    # Each failed pairing consumes the stale ticket, so this ends once the
+    # user is paired or queued
+    while True:
+        opponent_id = queue.enqueue(user.id, bet_amount)
+        if opponent_id is None:
+            return None
+
+        try:
+            return create_match(opponent_id, user.id, bet_amount)
+        except OpponentUnavailable:
+            # The waiting player can no longer pay; try the next ticket
+            logger.info(f"Quick match ticket of user {opponent_id} dropped: insufficient balance")
+        except Exception:
+            queue.requeue(opponent_id, bet_amount)
+            raise
+
+
+def cancel_quick_match(user):
+    """Remove ``user`` from the quick-match queue"""
+    return get_queue().cancel(user.id)
+
+
+def create_match(player1_id, player2_id, bet_amount):
+    """
+    Create the game and charge both players atomically.
+
+    Wallets are locked in id order so concurrent pairings can't deadlock.
+    The waiting player (player1) opens as X.
+    """
+    from user_wallet.ledger import Entry, post_entries
+    from user_wallet.models import Wallet
+    from .models import CaroGame
+
+    room_name = f"quick_{uuid.uuid4().hex[:10]}"
+
+    with transaction.atomic():
+        wallets = {
+            wallet.user_id: wallet
+            for wallet in Wallet.objects.select_for_update().filter(
+                user_id__in=[player1_id, player2_id]
+            ).order_by('id')
+        }
+        if player1_id not in wallets or not wallets[player1_id].has_sufficient_balance(bet_amount):
+            raise OpponentUnavailable("Opponent can no longer cover the bet")
+        if player2_id not in wallets or not wallets[player2_id].has_sufficient_balance(bet_amount):
+            raise MatchmakingError("Insufficient balance")
+
+        game = CaroGame.objects.create(
+            room_name=room_name,
+            player1_id=player1_id,
+            player2_id=player2_id,
+            status='playing',
+            bet_amount=bet_amount,
+            started_at=timezone.now()
+        )
+
+        # Both bets in one posting: one INSERT, one notification per player
+        post_entries([
+            Entry(wallets[user_id], -bet_amount, 'game_bet',
+                  f'Bet for quick Caro game room: {room_name}', game)
+            for user_id in (player1_id, player2_id)
+        ])
+
+        transaction.on_commit(lambda: _notify_match_found(game.pk))
+
+    return game
+
+
+def _notify_match_found(game_pk):
+    from chat.realtime_helpers import notify_caro_match_found
+    from .models import CaroGame
+
+    try:
+        game = CaroGame.objects.select_related('player1', 'player2').get(pk=game_pk)
+        notify_caro_match_found(game)
+    except Exception as e:
+        logger.error(f"Error notifying quick match {game_pk}: {e}")
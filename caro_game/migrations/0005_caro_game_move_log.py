@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caro_game', '0004_simplified_caro_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carogame',
+            name='move_log',
+            field=models.BinaryField(default=b''),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caro_game', '0005_caro_game_move_log'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carogame',
+            index=models.Index(fields=['status', 'updated_at'], name='caro_game_c_status_5645b9_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('caro_game', '0006_caro_game_status_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('games_played', models.IntegerField(default=0)),
+                ('games_won', models.IntegerField(default=0)),
+                ('games_lost', models.IntegerField(default=0)),
+                ('games_drawn', models.IntegerField(default=0)),
+                ('current_streak', models.IntegerField(default=0)),
+                ('best_streak', models.IntegerField(default=0)),
+                ('total_winnings', models.IntegerField(default=0)),
+                ('last_game_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='caro_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-games_won', 'user'], name='caro_game_p_games_w_6884af_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caro_game', '0007_player_stats'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='playerstats',
+            name='caro_game_p_games_w_6884af_idx',
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='rating',
+            field=models.FloatField(default=1200.0),
+        ),
+        migrations.AddIndex(
+            model_name='playerstats',
+            index=models.Index(fields=['-rating', 'user'], name='caro_game_p_rating_a42d19_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caro_game', '0008_player_stats_rating'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='carogame',
+            name='caro_game_c_status_5645b9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='carogame',
+            index=models.Index(fields=['updated_at', 'status'], name='caro_game_c_updated_5d6569_idx'),
+        ),
+    ]
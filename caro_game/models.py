@@ -66,6 +66,9 @@ class CaroGame(models.Model):
     total_moves = models.IntegerField(default=0)
     game_duration = models.DurationField(null=True, blank=True)
     
+    # Packed move history (see caro_game.movelog), complete when it holds total_moves moves
+    move_log = models.BinaryField(default=b'', editable=False)
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -74,8 +77,16 @@ class CaroGame(models.Model):
             models.Index(fields=['player1', '-created_at']),
             models.Index(fields=['player2', '-created_at']),
             models.Index(fields=['status', '-created_at']),
+            models.Index(fields=['updated_at', 'status']),  # incremental timer sync (caro_game.timers)
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so post_save can detect lobby transitions
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
     def __str__(self):
         return f'Caro Game {self.game_id}: {self.player1.username} vs {self.player2.username if self.player2 else "waiting"}'
     
@@ -97,6 +108,31 @@ class CaroGame(models.Model):
         """Get queryset of all moves in order"""
         return self.moves.all().select_related('player')
 
+    def get_move_log(self):
+        """Get the packed move log, rebuilding it from CaroMove rows if incomplete"""
+        from . import movelog
+        if movelog.move_count(self.move_log) == self.total_moves:
+            return bytes(self.move_log)
+        return movelog.encode(
+            self.moves.order_by('move_number').values_list('row', 'col', 'timestamp')
+        )
+
+    def get_move_records(self):
+        """Get all moves as dicts, decoded from the packed move log"""
+        from . import movelog
+        usernames = {
+            'X': self.player1.username,
+            'O': self.player2.username if self.player2 else None,
+        }
+        return [{
+            'row': row,
+            'col': col,
+            'symbol': symbol,
+            'move_number': move_number,
+            'player_username': usernames[symbol],
+            'timestamp': timestamp.isoformat(),
+        } for row, col, symbol, move_number, timestamp in movelog.decode(self.get_move_log())]
+
     def join_game(self, player2):
         """Join existing game"""
         if self.status != 'waiting' or self.player2:
@@ -109,44 +145,101 @@ class CaroGame(models.Model):
         self.save()
         return True
 
+    def get_board(self):
+        """Get the in-memory board for this game (rebuilt lazily from moves)"""
+        from .engine import get_board
+        return get_board(self)
+
+    def get_player_symbol(self, player):
+        """Get 'X' for player1, 'O' for player2, None for anyone else"""
+        if player.id == self.player1_id:
+            return 'X'
+        if self.player2_id and player.id == self.player2_id:
+            return 'O'
+        return None
+
+    def is_player_turn(self, player):
+        """Check if it's this player's turn"""
+        return self.get_player_symbol(player) == self.current_turn
+
+    def is_valid_move(self, row, col):
+        """Check if the position is on the board and still empty"""
+        return self.get_board().is_empty(row, col)
+
     def make_game_move(self, row, col, player):
-        """Make a move in the game"""
-        if self.status != 'playing':
-            return False, "Game is not in playing status"
-        
-        # Check if it's player's turn
-        current_symbol = 'X' if self.player1 == player else 'O'
-        if (current_symbol == 'X' and self.current_turn != 'X') or \
-           (current_symbol == 'O' and self.current_turn != 'O'):
-            return False, "Not your turn"
-        
-        # Check if move already exists at this position
-        if self.moves.filter(row=row, col=col).exists():
-            return False, "Position already occupied"
-        
-        # Create the move
-        CaroMove.objects.create(
-            game=self,
-            player=player,
-            row=row,
-            col=col,
-            symbol=current_symbol,
-            move_number=self.total_moves + 1
-        )
+        """
+        Make a move in the game.
+
+        The row is locked and re-read first, so concurrent requests (or the
+        websocket actor's guarded writes) cannot both take the same move
+        number, and only the move's own fields are written back.
+        """
+        from django.db import transaction
         
-        self.total_moves += 1
+        with transaction.atomic():
+            locked = CaroGame.objects.select_for_update().get(pk=self.pk)
+            for field in ('status', 'player2_id', 'current_turn', 'total_moves', 'move_log', 'started_at'):
+                setattr(self, field, getattr(locked, field))
+            
+            if self.status != 'playing':
+                return False, "Game is not in playing status"
+            
+            # Check if it's player's turn
+            current_symbol = self.get_player_symbol(player)
+            if current_symbol is None:
+                return False, "Not a player in this game"
+            if current_symbol != self.current_turn:
+                return False, "Not your turn"
+            
+            # Check occupancy against the in-memory board (rebuilt if another writer moved)
+            board = self.get_board()
+            if not board.in_bounds(row, col):
+                return False, "Invalid move position"
+            if not board.is_empty(row, col):
+                return False, "Position already occupied"
+            
+            # Read the log before the new row exists: an uncompacted game rebuilds it from CaroMove rows
+            log = self.get_move_log()
+            
+            # Create the move
+            move = CaroMove.objects.create(
+                game=self,
+                player=player,
+                row=row,
+                col=col,
+                symbol=current_symbol,
+                move_number=self.total_moves + 1
+            )
+            
+            from . import movelog
+            self.move_log = movelog.append(log, row, col, move.timestamp)
+            self.total_moves += 1
+            
+            # Only the lines through this stone can have produced a winner
+            if board.place(row, col, current_symbol):
+                self.finish_game(current_symbol)
+            else:
+                # Continue game - switch turn
+                self.current_turn = 'O' if current_symbol == 'X' else 'X'
+                self.save(update_fields=['total_moves', 'current_turn', 'move_log', 'updated_at'])
         
+        return True, "Move successful"
+    
+    def finish_game(self, winner_symbol):
+        """Mark the game as won by 'X' or 'O', pay the prize, update stats and save"""
+        from django.db import transaction
         from django.utils import timezone
+        from .engine import discard_board
         
-        # Check for winner
-        winner_symbol = self.check_winner()
-        if winner_symbol:
-            self.status = 'finished'
-            self.winner = self.player1 if winner_symbol == 'X' else self.player2
-            self.finished_at = timezone.now()
-            if self.started_at:
-                self.game_duration = self.finished_at - self.started_at
-            
+        discard_board(self.pk)
+        self.status = 'finished'
+        self.winner_id = self.player1_id if winner_symbol == 'X' else self.player2_id
+        self.finished_at = timezone.now()
+        if self.started_at:
+            self.game_duration = self.finished_at - self.started_at
+        
+        # Result, payout and player stats are settled together
+        with transaction.atomic():
             # Award prize to winner
             if self.winner and self.winner_prize > 0:
                 try:
@@ -161,96 +254,72 @@ class CaroGame(models.Model):
                     import logging
                     logger = logging.getLogger(__name__)
                     logger.error(f"Error awarding prize: {e}")
-        else:
-            # Continue game - switch turn
-            self.current_turn = 'O' if current_symbol == 'X' else 'X'
-        
-        self.save()
-        return True, "Move successful"
+                else:
+                    # The house keeps the rest of the pot (sharded, no hot row)
+                    from user_wallet.house import credit_house
+                    credit_house(self.house_fee, key=self.pk)
+            
+            self.save()
+            PlayerStats.record_game(self)
     
     def check_winner(self):
         """Check if there's a winner based on moves"""
-        moves = self.get_moves_list()
-        if not moves:
-            return None
-        
-        # Build board from moves
-        move_dict = {}
-        for move in moves:
-            move_dict[(move.row, move.col)] = move.symbol
-        
-        if not move_dict:
-            return None
-        
-        # Find board boundaries
-        rows = [r for r, c in move_dict.keys()]
-        cols = [c for r, c in move_dict.keys()]
-        min_row, max_row = min(rows), max(rows)
-        min_col, max_col = min(cols), max(cols)
-        
-        # Check all positions for winning patterns
-        directions = [(0, 1), (1, 0), (1, 1), (1, -1)]  # horizontal, vertical, diagonal
-        
-        for (row, col), symbol in move_dict.items():
-            for dr, dc in directions:
-                count = 1
-                
-                # Check forward direction
-                r, c = row + dr, col + dc
-                while (r, c) in move_dict and move_dict[(r, c)] == symbol:
-                    count += 1
-                    r, c = r + dr, c + dc
-                
-                # Check backward direction
-                r, c = row - dr, col - dc
-                while (r, c) in move_dict and move_dict[(r, c)] == symbol:
-                    count += 1
-                    r, c = r - dr, c - dc
-                
-                if count >= self.win_condition:
-                    return symbol
-        
-        return None
+        return self.get_board().winner
     
     def abandon_game(self, player):
-        """Abandon game by player"""
-        if self.status not in ['waiting', 'playing']:
-            return False
+        """
+        Abandon the game on behalf of ``player``.
         
+        The row is locked and re-read, so a repeated or concurrent abandon
+        sees the settled status. A waiting room refunds player1's bet; a
+        game in progress is won by the opponent, who gets the prize, and
+        the result is recorded in PlayerStats like any finished game.
+        Returns (success, message).
+        """
+        from django.db import transaction
         from django.utils import timezone
-        self.status = 'abandoned'
-        self.finished_at = timezone.now()
+        from user_wallet.house import credit_house
+        from user_wallet.ledger import post_entry
+        from .engine import discard_board
         
-        # If game was in progress, other player wins
-        if self.status == 'playing' and self.player2:
-            self.winner = self.player2 if player == self.player1 else self.player1
+        with transaction.atomic():
+            game = CaroGame.objects.select_for_update().get(pk=self.pk)
+            if player.id not in [game.player1_id, game.player2_id]:
+                return False, "Not a player in this game"
+            if game.status not in ['waiting', 'playing']:
+                return False, f"Game is already {game.status}"
             
-            # Update statistics
-            winner_profile = getattr(self.winner, 'profile', None)
-            loser_profile = getattr(player, 'profile', None)
+            if game.status == 'waiting':
+                post_entry(
+                    game.player1.wallet, game.bet_amount, 'game_refund',
+                    f'Refund for abandoned Caro game room: {game.room_name}', game
+                )
+            else:
+                # The opponent wins
+                game.winner = game.player2 if player.id == game.player1_id else game.player1
+                post_entry(
+                    game.winner.wallet, game.winner_prize, 'game_win',
+                    f'Won Caro game (opponent abandoned): {game.room_name}', game
+                )
+                credit_house(game.house_fee, key=game.pk)
             
-            if winner_profile:
-                winner_profile.update_game_stats(won=True)
-            if loser_profile:
-                loser_profile.update_game_stats(won=False)
+            game.status = 'abandoned'
+            game.finished_at = timezone.now()
+            if game.started_at:
+                game.game_duration = game.finished_at - game.started_at
+            game.save()
+            if game.winner_id:
+                # An abandon win counts like any other result, Elo included
+                PlayerStats.record_game(game)
         
-        self.save()
-        return True
-
+        discard_board(self.pk)
+        self.refresh_from_db()
+        return True, "Game abandoned"
+    
     def to_dict(self):
         """Convert to dictionary for API responses"""
         # Serialize moves
-        moves_data = [
-            {
-                'row': move.row,
-                'col': move.col,
-                'symbol': move.symbol,
-                'move_number': move.move_number,
-                'player_username': move.player.username,
-                'timestamp': move.timestamp.isoformat()
-            }
-            for move in self.get_moves_list()
-        ]
+        moves_data = self.get_move_records()
         
         return {
             'id': self.id,
@@ -284,6 +353,103 @@ class CaroGame(models.Model):
         }
 
 
+class PlayerStats(models.Model):
+    """Per-player Caro totals, updated when each game is settled"""
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='caro_stats')
+    games_played = models.IntegerField(default=0)
+    games_won = models.IntegerField(default=0)
+    games_lost = models.IntegerField(default=0)
+    games_drawn = models.IntegerField(default=0)
+    current_streak = models.IntegerField(default=0)  # Consecutive wins up to the last game
+    best_streak = models.IntegerField(default=0)
+    total_winnings = models.IntegerField(default=0)  # Sum of prizes won
+    rating = models.FloatField(default=1200.0)  # Elo, see caro_game.ratings
+    last_game_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rating', 'user']),
+        ]
+    
+    def __str__(self):
+        return f'{self.user.username}: {self.games_won}/{self.games_played} wins'
+    
+    @property
+    def win_rate(self):
+        """Win rate percentage"""
+        if self.games_played == 0:
+            return 0
+        return round(self.games_won / self.games_played * 100, 1)
+    
+    @classmethod
+    def for_user(cls, user):
+        """Stats of a user (an empty unsaved row if they never finished a game)"""
+        return cls.objects.filter(user=user).first() or cls(user=user)
+    
+    def get_rank(self):
+        """1-based leaderboard position; an index range count on rating"""
+        return PlayerStats.objects.filter(rating__gt=self.rating).count() + 1
+    
+    def get_rating_percentile(self):
+        """Share of rated players below this rating (cached histogram)"""
+        from .ratings import rating_percentile
+        return rating_percentile(self.rating)
+    
+    @classmethod
+    def rated_games(cls):
+        """Games that count towards stats: finished, or abandoned with a winner"""
+        return CaroGame.objects.filter(
+            models.Q(status='finished') | models.Q(status='abandoned', winner__isnull=False),
+            player2__isnull=False
+        )
+    
+    @classmethod
+    def record_game(cls, game):
+        """
+        Add a settled game to both players' stats.
+        
+        Must run inside the transaction that settles the game, so the totals
+        can never disagree with the game rows. Rows are locked in user id
+        order to avoid deadlocks between concurrent games.
+        """
+        if not game.player2_id:
+            return
+        
+        player_ids = sorted([game.player1_id, game.player2_id])
+        for user_id in player_ids:
+            cls.objects.get_or_create(user_id=user_id)
+        stats_by_user = {
+            stats.user_id: stats
+            for stats in cls.objects.select_for_update().filter(user_id__in=player_ids).order_by('user_id')
+        }
+        
+        for user_id, stats in stats_by_user.items():
+            stats.games_played += 1
+            stats.last_game_at = game.finished_at
+            if game.winner_id is None:
+                stats.games_drawn += 1
+                stats.current_streak = 0
+            elif game.winner_id == user_id:
+                stats.games_won += 1
+                stats.current_streak += 1
+                stats.best_streak = max(stats.best_streak, stats.current_streak)
+                stats.total_winnings += game.winner_prize
+            else:
+                stats.games_lost += 1
+                stats.current_streak = 0
+        
+        from .ratings import rate, game_score
+        player1, player2 = stats_by_user[game.player1_id], stats_by_user[game.player2_id]
+        player1.rating, player2.rating = rate(
+            player1.rating, player2.rating, game_score(game.player1_id, game.winner_id)
+        )
+        
+        for stats in stats_by_user.values():
+            stats.save()
+
+
 # ===========================
 # UTILITY FUNCTIONS FOR CARO GAMES
 # ===========================
@@ -307,53 +473,47 @@ def get_active_game(room_name: str):
     
     return None
 
+def abandon_game(room_name: str, username: str):
+    """Abandon the latest game of a room on behalf of ``username`` (see CaroGame.abandon_game)"""
+    from django.contrib.auth.models import User
+    
+    game = CaroGame.objects.filter(room_name=room_name).order_by('-created_at').first()
+    player = User.objects.filter(username=username).first()
+    if game is None or player is None:
+        return False
+    success, message = game.abandon_game(player)
+    if not success:
+        logger.warning(f"Could not abandon Caro game in room {room_name}: {message}")
+    return success
+
 def create_game(room_name: str, player1_username: str):
     """Create new Caro game with wallet check and active game validation"""
     try:
         from django.contrib.auth.models import User
         from user_wallet.models import Wallet
-        from datetime import datetime, timezone, timedelta
         
         player1 = User.objects.get(username=player1_username)
         
+        # Free the name if its waiting game is overdue (no-op when the timers keep up)
+        from .timers import expire_room
+        expire_room(room_name)
+        
         # Check if there's already an active game in this room
         existing_game = get_active_game(room_name)
         if existing_game:
             if existing_game.get('status') == 'playing':
                 return {'error': 'game_in_progress', 'message': f'Room "{room_name}" has a game in progress. Please choose a different name.'}
             elif existing_game.get('status') == 'waiting':
-                # Check if the waiting game is old (more than 10 minutes)
-                game_age = datetime.now(timezone.utc) - existing_game.get('created_at')
-                
-                if game_age > timedelta(minutes=10):
-                    # Remove old waiting game
-                    try:
-                        old_game = CaroGame.objects.get(id=existing_game.get('id'))
-                        # Refund the player
-                        try:
-                            old_wallet = old_game.player1.wallet
-                            old_wallet.add_balance(10000, 'caro_refund', f'Refund for expired game in room {room_name}')
-                            logger.info(f"Refunded 10,000 to {old_game.player1.username} for expired game")
-                        except Exception as refund_error:
-                            logger.error(f"Error refunding player: {refund_error}")
-                        
-                        old_game.delete()
-                        logger.info(f"Removed old waiting game in room {room_name}")
-                    except Exception as delete_error:
-                        logger.error(f"Error deleting old game: {delete_error}")
-                        return {'error': 'cleanup_failed', 'message': 'Failed to clean up old game'}
+                if existing_game.get('player1') == player1_username:
+                    # User is trying to create again, return existing game
+                    return existing_game
                 else:
-                    # Game is waiting and recent
-                    if existing_game.get('player1') == player1_username:
-                        # User is trying to create again, return existing game
-                        return existing_game
-                    else:
-                        # Suggest joining the existing game
-                        return {
-                            'error': 'game_waiting', 
-                            'message': f'Room "{room_name}" has a game waiting for players. Please join the existing game or choose a different name.',
-                            'existing_game': existing_game
-                        }
+                    # Suggest joining the existing game
+                    return {
+                        'error': 'game_waiting', 
+                        'message': f'Room "{room_name}" has a game waiting for players. Please join the existing game or choose a different name.',
+                        'existing_game': existing_game
+                    }
         
         # Check if player1 has wallet and sufficient balance
         try:
@@ -0,0 +1,86 @@
+"""
+Packed Caro move log
+
+A game's moves are stored as one small blob on ``CaroGame.move_log``
+instead of being re-read from one CaroMove row per move.
+
+Layout (big-endian):
+    header  9 bytes   format version (uint8), time of the first move (uint64, epoch ms)
+    record  3 bytes   cell index row * BOARD_SIZE + col (uint8),
+                      deciseconds since the previous move (uint16)
+
+X always opens, so the symbol (and hence the player) of a move follows
+from its position in the log. Delays longer than ~109 minutes are
+clamped; decoded timestamps are accurate to 0.1s.
+"""
+import struct
+from datetime import datetime, timezone as dt_timezone
+
+from .engine import BOARD_SIZE
+
+FORMAT_VERSION = 1
+HEADER = struct.Struct('>BQ')
+RECORD = struct.Struct('>BH')
+MAX_DELTA = 0xFFFF
+
+
+def move_count(log):
+    """Number of moves stored in a log"""
+    if not log:
+        return 0
+    return (len(log) - HEADER.size) // RECORD.size
+
+
+def encode(moves):
+    """Pack ordered (row, col, timestamp) tuples into a move log"""
+    log = b''
+    for row, col, timestamp in moves:
+        log = append(log, row, col, timestamp)
+    return log
+
+
+def append(log, row, col, timestamp):
+    """Return the log with one more move added"""
+    log = bytes(log or b'')
+    millis = int(timestamp.timestamp() * 1000)
+
+    if not log:
+        return HEADER.pack(FORMAT_VERSION, millis) + RECORD.pack(row * BOARD_SIZE + col, 0)
+
+    # Deltas are taken against the decoded clock, so a clamped gap is
+    # caught up by the following moves instead of shifting them all
+    clock = _last_millis(log)
+    delta = min(max((millis - clock) // 100, 0), MAX_DELTA)
+    return log + RECORD.pack(row * BOARD_SIZE + col, delta)
+
+
+def decode(log):
+    """Unpack a log into (row, col, symbol, move_number, timestamp) tuples"""
+    if not log:
+        return []
+    log = bytes(log)
+
+    version, clock = HEADER.unpack_from(log)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported move log version {version}")
+
+    moves = []
+    for index, (cell, delta) in enumerate(RECORD.iter_unpack(log[HEADER.size:])):
+        clock += delta * 100
+        row, col = divmod(cell, BOARD_SIZE)
+        moves.append((
+            row,
+            col,
+            'X' if index % 2 == 0 else 'O',
+            index + 1,
+            datetime.fromtimestamp(clock / 1000, tz=dt_timezone.utc),
+        ))
+    return moves
+
+
+def _last_millis(log):
+    """Epoch ms of the last move in a non-empty log"""
+    _, clock = HEADER.unpack_from(log)
+    for _, delta in RECORD.iter_unpack(log[HEADER.size:]):
+        clock += delta * 100
+    return clock
@@ -0,0 +1,176 @@
+"""
+Elo ratings for Caro players
+
+Ratings live on PlayerStats.rating and move by
+
+    new = old + K * (score - expected),  expected = 1 / (1 + 10 ** ((opp - old) / 400))
+
+once per settled game (see PlayerStats.record_game). recompute_ratings()
+replays the whole history when the formula or K changes: games are split
+into rounds in which no player appears twice, so every round is one
+vectorized numpy update (a pure-Python loop is used when numpy is not
+installed).
+
+Percentiles come from a cached rating histogram, so they cost a dict
+lookup instead of a COUNT per request.
+"""
+import bisect
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only used by batch recomputation
+    np = None
+
+BASE_RATING = getattr(settings, 'CARO_BASE_RATING', 1200)
+K_FACTOR = getattr(settings, 'CARO_RATING_K_FACTOR', 32)
+
+HISTOGRAM_KEY = 'caro_rating_histogram'
+HISTOGRAM_TIMEOUT = 300
+HISTOGRAM_BUCKET = 10  # rating points per histogram bucket
+
+
+def expected_score(rating, opponent_rating):
+    """Probability-like expected score of ``rating`` against ``opponent_rating``"""
+    return 1.0 / (1.0 + 10 ** ((opponent_rating - rating) / 400.0))
+
+
+def rate(rating1, rating2, score1, k_factor=K_FACTOR):
+    """New ratings after one game; score1 is 1 (player1 won), 0.5 (draw) or 0"""
+    delta = k_factor * (score1 - expected_score(rating1, rating2))
+    return rating1 + delta, rating2 - delta
+
+
+def game_score(player1_id, winner_id):
+    """player1's score in a settled game"""
+    if winner_id is None:
+        return 0.5
+    return 1.0 if winner_id == player1_id else 0.0
+
+
+# ===========================
+# BATCH RECOMPUTATION
+# ===========================
+def recompute_ratings(games, k_factor=K_FACTOR, base_rating=BASE_RATING):
+    """
+    Replay ordered (player1_id, player2_id, winner_id) games from scratch.
+
+    Returns {user_id: rating}.
+    """
+    games = list(games)
+    players = sorted({user_id for game in games for user_id in game[:2]})
+    slots = {user_id: slot for slot, user_id in enumerate(players)}
+
+    p1 = [slots[game[0]] for game in games]
+    p2 = [slots[game[1]] for game in games]
+    scores = [game_score(game[0], game[2]) for game in games]
+
+    rounds = _conflict_free_rounds(p1, p2, len(players))
+
+    if np is not None:
+        ratings = _replay_numpy(p1, p2, scores, rounds, len(players), k_factor, base_rating)
+    else:
+        ratings = _replay_python(p1, p2, scores, rounds, len(players), k_factor, base_rating)
+
+    return {user_id: float(ratings[slot]) for user_id, slot in slots.items()}
+
+
+def _conflict_free_rounds(p1, p2, player_count):
+    """
+    Group game indexes into rounds where each player appears at most once.
+
+    A game goes in the round after the latest round of either player, so
+    every player's games keep their original order.
+    """
+    last_round = [-1] * player_count
+    rounds = []
+    for index, (a, b) in enumerate(zip(p1, p2)):
+        round_number = max(last_round[a], last_round[b]) + 1
+        last_round[a] = last_round[b] = round_number
+        if round_number == len(rounds):
+            rounds.append([])
+        rounds[round_number].append(index)
+    return rounds
+
+
+def _replay_numpy(p1, p2, scores, rounds, player_count, k_factor, base_rating):
+    p1 = np.asarray(p1, dtype=np.int64)
+    p2 = np.asarray(p2, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    ratings = np.full(player_count, float(base_rating))
+
+    for round_games in rounds:
+        index = np.asarray(round_games, dtype=np.int64)
+        a, b = p1[index], p2[index]
+        expected = 1.0 / (1.0 + 10.0 ** ((ratings[b] - ratings[a]) / 400.0))
+        delta = k_factor * (scores[index] - expected)
+        # No player repeats within a round, so plain fancy-index updates are safe
+        ratings[a] += delta
+        ratings[b] -= delta
+
+    return ratings
+
+
+def _replay_python(p1, p2, scores, rounds, player_count, k_factor, base_rating):
+    ratings = [float(base_rating)] * player_count
+    for round_games in rounds:
+        for index in round_games:
+            a, b = p1[index], p2[index]
+            ratings[a], ratings[b] = rate(ratings[a], ratings[b], scores[index], k_factor)
+    return ratings
+
+
+# ===========================
+# PERCENTILES
+# ===========================
+def get_histogram():
+    """Cumulative rating histogram: (bucket floors, players below each floor, total)"""
+    histogram = cache.get(HISTOGRAM_KEY)
+    if histogram is None:
+        histogram = build_histogram()
+    return histogram
+
+
+def build_histogram():
+    """One GROUP BY over PlayerStats.rating, cached for HISTOGRAM_TIMEOUT"""
+    from django.db.models import Count, F, IntegerField
+    from django.db.models.functions import Cast, Floor
+    from .models import PlayerStats
+
+    rows = (
+        PlayerStats.objects
+        .filter(games_played__gt=0)
+        .annotate(bucket=Cast(Floor(F('rating') / HISTOGRAM_BUCKET), IntegerField()))
+        .values('bucket')
+        .annotate(players=Count('id'))
+        .order_by('bucket')
+    )
+
+    floors, below, total = [], [], 0
+    for row in rows:
+        floors.append(row['bucket'] * HISTOGRAM_BUCKET)
+        below.append(total)
+        total += row['players']
+
+    histogram = (floors, below, total)
+    cache.set(HISTOGRAM_KEY, histogram, timeout=HISTOGRAM_TIMEOUT)
+    return histogram
+
+
+def rating_percentile(rating):
+    """Share of rated players (0-100) with a lower rating, from the cached histogram"""
+    floors, below, total = get_histogram()
+    if not total:
+        return None
+    position = bisect.bisect_right(floors, rating) - 1
+    if position < 0:
+        return 0.0
+    # Spread the bucket's players evenly across its width
+    in_bucket = (below[position + 1] if position + 1 < len(below) else total) - below[position]
+    fraction = min(1.0, (rating - floors[position]) / HISTOGRAM_BUCKET)
+    return round((below[position] + in_bucket * fraction) / total * 100, 1)
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import CaroGame
+from .models import CaroGame, PlayerStats
 
 
 class UserSimpleSerializer(serializers.ModelSerializer):
@@ -50,16 +50,37 @@ class CaroGameSerializer(serializers.ModelSerializer):
         ]
     
     def get_moves(self, obj):
-        """Get all moves for the game"""
-        moves = obj.moves.all().order_by('move_number')
-        return [{
-            'row': move.row,
-            'col': move.col,
-            'symbol': move.symbol,
-            'move_number': move.move_number,
-            'player_username': move.player.username,
-            'timestamp': move.timestamp.isoformat(),
-        } for move in moves]
+        """Get all moves for the game (decoded from the packed move log)"""
+        return obj.get_move_records()
+
+
+class CaroGameListSerializer(serializers.ModelSerializer):
+    """Lightweight game row for list endpoints (no moves, no move log)"""
+    player1 = UserSimpleSerializer(read_only=True)
+    player2 = UserSimpleSerializer(read_only=True, allow_null=True)
+    winner = UserSimpleSerializer(read_only=True, allow_null=True)
+    
+    class Meta:
+        model = CaroGame
+        fields = [
+            'id', 'game_id', 'room_name',
+            'player1', 'player2', 'winner',
+            'current_turn', 'status', 'total_moves',
+            'bet_amount', 'total_pot', 'winner_prize',
+            'created_at', 'updated_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+    
+    USER_FIELDS = ['username', 'first_name', 'last_name']
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the players in the same query and load only the listed columns"""
+        related = ['player1', 'player2', 'winner']
+        columns = [name for name in cls.Meta.fields if name not in related] + [
+            f'{relation}__{field}' for relation in related for field in cls.USER_FIELDS
+        ]
+        return queryset.select_related(*related).only(*columns)
 
 
 class CaroGameCreateSerializer(serializers.Serializer):
@@ -68,6 +89,8 @@ class CaroGameCreateSerializer(serializers.Serializer):
     
     def validate_room_name(self, value):
         """Check if room name already exists"""
+        from .timers import expire_room
+        expire_room(value)
         if CaroGame.objects.filter(room_name=value, status__in=['waiting', 'playing']).exists():
             raise serializers.ValidationError("Room name already exists")
         return value
@@ -137,3 +160,18 @@ class CaroGameStatsSerializer(serializers.Serializer):
     win_rate = serializers.FloatField()
     current_streak = serializers.IntegerField()
     best_streak = serializers.IntegerField()
+    rating = serializers.FloatField()
+    rating_percentile = serializers.FloatField(allow_null=True)
+
+
+class PlayerStatsSerializer(serializers.ModelSerializer):
+    """Materialized per-player statistics (leaderboard rows)"""
+    user = UserSimpleSerializer(read_only=True)
+    win_rate = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = PlayerStats
+        fields = [
+            'user', 'games_played', 'games_won', 'games_lost', 'games_drawn',
+            'rating', 'win_rate', 'current_streak', 'best_streak', 'total_winnings', 'last_game_at'
+        ]
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CaroGame
+from . import lobby
+
+
+@receiver(post_save, sender=CaroGame)
+def caro_game_lobby_update(sender, instance, created, **kwargs):
+    """Push create/join/finish/abandon transitions to the lobby index"""
+    previous_status = getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    lobby.game_changed(instance, created, previous_status)
+
+
+@receiver(post_delete, sender=CaroGame)
+def caro_game_lobby_remove(sender, instance, **kwargs):
+    """Drop deleted games from the lobby index"""
+    lobby.game_deleted(instance)
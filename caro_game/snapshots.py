@@ -0,0 +1,125 @@
+"""
+Immutable snapshots of settled Caro games
+
+A game that reached ``finished`` or ``abandoned`` never changes again, so
+its API documents are serialized once and kept in the cache:
+
+    caro_final_<kind>_<game pk>  ->  sha256 of the document
+    caro_blob_<sha256>           ->  the JSON document itself
+
+The digest doubles as a strong ETag. Serving a cached snapshot is two
+cache reads and no queries; a miss rebuilds it from the database.
+"""
+import hashlib
+import json
+import logging
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ('finished', 'abandoned')
+SNAPSHOT_TIMEOUT = getattr(settings, 'CARO_FINAL_SNAPSHOT_TIMEOUT', 60 * 60 * 24 * 7)
+
+# Cache-Control for URLs that always name the same settled game
+IMMUTABLE_CACHE_CONTROL = f'private, max-age={SNAPSHOT_TIMEOUT}, immutable'
+
+
+class Snapshot(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def is_final(status):
+    """True once a game can no longer change"""
+    return status in FINAL_STATUSES
+
+
+def _pointer_key(kind, game_pk):
+    return f'caro_final_{kind}_{game_pk}'
+
+
+def _blob_key(digest):
+    return f'caro_blob_{digest}'
+
+
+def get_cached(kind, game_pk):
+    """Snapshot of ``kind`` for a settled game, or None if not cached"""
+    digest = cache.get(_pointer_key(kind, game_pk))
+    if digest is None:
+        return None
+    body = cache.get(_blob_key(digest))
+    if body is None:
+        return None
+    return Snapshot(body, f'"{digest}"')
+
+
+def store(kind, game_pk, document):
+    """Serialize ``document`` canonically and cache it under its digest"""
+    body = json.dumps(document, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':')).encode()
+    digest = hashlib.sha256(body).hexdigest()
+    cache.set_many({
+        _blob_key(digest): body,
+        _pointer_key(kind, game_pk): digest,
+    }, timeout=SNAPSHOT_TIMEOUT)
+    return Snapshot(body, f'"{digest}"')
+
+
+def get_snapshot(kind, game):
+    """Cached snapshot of a settled game, built from ``game`` on a miss"""
+    snapshot = get_cached(kind, game.pk)
+    if snapshot is None:
+        snapshot = store(kind, game.pk, BUILDERS[kind](game))
+        logger.debug(f"Stored {kind} snapshot of Caro game {game.game_id}")
+    return snapshot
+
+
+# ===========================
+# DOCUMENTS
+# ===========================
+def build_game_document(game):
+    """Full game state, as returned by the detail endpoint"""
+    from .serializers import CaroGameSerializer
+    return CaroGameSerializer(game).data
+
+
+def build_replay_document(game):
+    """Moves with their offset from the first move, for timed playback"""
+    from . import movelog
+
+    moves = []
+    first_timestamp = None
+    for row, col, symbol, move_number, timestamp in movelog.decode(game.get_move_log()):
+        if first_timestamp is None:
+            first_timestamp = timestamp
+        moves.append({
+            'move_number': move_number,
+            'row': row,
+            'col': col,
+            'symbol': symbol,
+            'offset_ms': int((timestamp - first_timestamp).total_seconds() * 1000),
+        })
+
+    return {
+        'id': game.id,
+        'game_id': game.game_id,
+        'room_name': game.room_name,
+        'player1': game.player1.username,
+        'player2': game.player2.username if game.player2 else None,
+        'winner': game.winner.username if game.winner else None,
+        'status': game.status,
+        'win_condition': game.win_condition,
+        'started_at': game.started_at,
+        'finished_at': game.finished_at,
+        'duration_ms': moves[-1]['offset_ms'] if moves else 0,
+        'moves': moves,
+    }
+
+
+BUILDERS = {
+    'game': build_game_document,
+    'replay': build_replay_document,
+}
@@ -0,0 +1,269 @@
+"""
+Caro game timers
+
+A heap-based scheduler holding one timer per live game:
+
+    ('turn', game id)     the player to move forfeits after CARO_TURN_TIMEOUT
+    ('waiting', game id)  an unjoined room expires after CARO_WAITING_TIMEOUT
+                          and player1's bet is refunded
+
+Scheduling and cancelling are O(log n) / O(1); cancelled entries are
+dropped lazily when they reach the top of the heap (or in a compaction
+once they outnumber live ones), so 100k+ timers cost one small list per
+timer.
+
+Timers are derived from the game rows themselves (``status`` plus
+``created_at`` / ``updated_at``), so the scheduler process keeps no
+state of its own: it rehydrates on start and then follows changes through
+the ``(updated_at, status)`` index. Every expiry is re-checked under a
+row lock before anything is written.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+TURN_TIMEOUT = getattr(settings, 'CARO_TURN_TIMEOUT', 120)
+WAITING_TIMEOUT = getattr(settings, 'CARO_WAITING_TIMEOUT', 600)
+SYNC_INTERVAL = getattr(settings, 'CARO_TIMER_SYNC_INTERVAL', 5)
+SYNC_OVERLAP = 30  # seconds re-read on each sync, covers late commits and clock skew
+
+
+class TimerScheduler:
+    """Min-heap of [deadline, seq, key, callback] entries with lazy cancellation"""
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self._cancelled = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def schedule(self, key, deadline, callback):
+        """Set (or move) the timer ``key`` to fire ``callback(key)`` at ``deadline`` (epoch seconds)"""
+        with self._lock:
+            self._discard(key)
+            entry = [deadline, next(self._counter), key, callback]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+
+    def cancel(self, key):
+        """Drop the timer ``key``; True if it existed"""
+        with self._lock:
+            return self._discard(key)
+
+    def next_deadline(self):
+        """Deadline of the earliest live timer, or None"""
+        with self._lock:
+            self._skip_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """Remove and return the (key, callback) pairs whose deadline has passed"""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, key, callback = heapq.heappop(self._heap)
+                if callback is None:
+                    self._cancelled -= 1
+                    continue
+                del self._entries[key]
+                due.append((key, callback))
+        return due
+
+    def run_pending(self, now=None):
+        """
+        Fire every due timer; a failing callback is logged and skipped.
+
+        A callback may return a new deadline to re-arm its timer.
+        """
+        fired = 0
+        for key, callback in self.pop_due(now):
+            try:
+                deadline = callback(key)
+                if deadline is not None:
+                    self.schedule(key, deadline, callback)
+                fired += 1
+            except Exception as e:
+                logger.error(f"Timer {key} failed: {e}", exc_info=True)
+        return fired
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[-1] = None
+        self._cancelled += 1
+        if self._cancelled > len(self._entries) and self._cancelled > 1024:
+            # Mostly tombstones: rebuild the heap from live entries
+            self._heap = [entry for entry in self._heap if entry[-1] is not None]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+        return True
+
+    def _skip_cancelled(self):
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+
+
+# ===========================
+# GAME TIMERS
+# ===========================
+def schedule_game(scheduler, game_id, status, created_at, updated_at):
+    """Put a game's timer in line with its current row"""
+    if status == 'waiting':
+        scheduler.cancel(('turn', game_id))
+        deadline = created_at + timedelta(seconds=WAITING_TIMEOUT)
+        scheduler.schedule(('waiting', game_id), deadline.timestamp(), expire_waiting_game)
+    elif status == 'playing':
+        scheduler.cancel(('waiting', game_id))
+        deadline = updated_at + timedelta(seconds=TURN_TIMEOUT)
+        scheduler.schedule(('turn', game_id), deadline.timestamp(), forfeit_turn)
+    else:
+        scheduler.cancel(('waiting', game_id))
+        scheduler.cancel(('turn', game_id))
+
+
+def sync_games(scheduler, since=None, batch_size=2000):
+    """
+    (Re)schedule every game changed since ``since`` (all live games if None).
+
+    Returns the timestamp to pass as ``since`` next time.
+    """
+    from .models import CaroGame
+
+    started = timezone.now()
+    games = CaroGame.objects.all()
+    if since is None:
+        games = games.filter(status__in=['waiting', 'playing'])
+    else:
+        games = games.filter(updated_at__gte=since)
+
+    rows = games.values_list('id', 'status', 'created_at', 'updated_at')
+    count = 0
+    for game_id, status, created_at, updated_at in rows.iterator(chunk_size=batch_size):
+        schedule_game(scheduler, game_id, status, created_at, updated_at)
+        count += 1
+
+    if count:
+        logger.debug(f"Caro timers synced {count} games, {len(scheduler)} timers live")
+    return started - timedelta(seconds=SYNC_OVERLAP)
+
+
+def expire_waiting_game(key):
+    """Abandon a room nobody joined and refund player1's bet"""
+    from .models import CaroGame
+
+    _, game_id = key
+    with transaction.atomic():
+        game = CaroGame.objects.select_for_update().filter(pk=game_id).first()
+        if game is None or game.status != 'waiting' or game.player2_id:
+            return
+        deadline = game.created_at + timedelta(seconds=WAITING_TIMEOUT)
+        if deadline > timezone.now():
+            return deadline.timestamp()
+
+        game.status = 'abandoned'
+        game.finished_at = timezone.now()
+        game.save()
+
+        if game.bet_amount > 0:
+            game.player1.wallet.add_balance(
+                amount=game.bet_amount,
+                transaction_type='game_refund',
+                description=f'Refund for expired Caro game room: {game.room_name}',
+                game=game
+            )
+
+    logger.info(f"Expired waiting Caro game {game.game_id}, refunded {game.bet_amount:,}")
+
+
+def expire_room(room_name):
+    """
+    Expire the room's overdue waiting games right away.
+
+    Called before a room name is reused, so a stale room is freed even
+    where no ``run_caro_timers`` process is running.
+    """
+    from .models import CaroGame
+
+    cutoff = timezone.now() - timedelta(seconds=WAITING_TIMEOUT)
+    overdue = CaroGame.objects.filter(
+        room_name=room_name,
+        status='waiting',
+        created_at__lte=cutoff
+    ).values_list('id', flat=True)
+    for game_id in overdue:
+        expire_waiting_game(('waiting', game_id))
+
+
+def forfeit_turn(key):
+    """The player to move ran out of time: the opponent wins"""
+    from .models import CaroGame
+
+    _, game_id = key
+    with transaction.atomic():
+        game = CaroGame.objects.select_for_update().filter(pk=game_id).first()
+        if game is None or game.status != 'playing':
+            return
+        deadline = game.updated_at + timedelta(seconds=TURN_TIMEOUT)
+        if deadline > timezone.now():
+            return deadline.timestamp()  # a move landed meanwhile
+
+        winner_symbol = 'O' if game.current_turn == 'X' else 'X'
+        game.finish_game(winner_symbol)
+        transaction.on_commit(lambda: _notify_forfeit(game))
+
+    logger.info(f"Caro game {game.game_id} forfeited on time by {game.current_turn}")
+
+
+def _notify_forfeit(game):
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+    from chat.realtime_helpers import notify_caro_game_ended
+
+    try:
+        # Game sockets reload the finished state from the database
+        for group in (f'caro_game_{game.room_name}', f'caro_watch_{game.room_name}'):
+            async_to_sync(get_channel_layer().group_send)(
+                group,
+                {'type': 'game_reload', 'reason': 'turn_timeout', 'version': game.updated_at.timestamp()}
+            )
+        notify_caro_game_ended(game, winner=game.winner)
+    except Exception as e:
+        logger.error(f"Error notifying forfeit of game {game.pk}: {e}")
+
+
+def run(scheduler=None, sync_interval=SYNC_INTERVAL, stop_event=None):
+    """Rehydrate from the database, then fire timers and follow game changes"""
+    scheduler = scheduler or TimerScheduler()
+    since = sync_games(scheduler)
+    logger.info(f"Caro timers rehydrated: {len(scheduler)} timers")
+
+    next_sync = time.time() + sync_interval
+    while stop_event is None or not stop_event.is_set():
+        scheduler.run_pending()
+
+        now = time.time()
+        if now >= next_sync:
+            since = sync_games(scheduler, since)
+            next_sync = now + sync_interval
+
+        next_deadline = scheduler.next_deadline()
+        wake = next_sync if next_deadline is None else min(next_sync, next_deadline)
+        time.sleep(max(0.0, min(wake - time.time(), sync_interval)))
+
+    return scheduler
@@ -4,7 +4,7 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.models import User
 from django.db.models import Q
-from .models import CaroGame, CaroMove
+from .models import CaroGame, CaroMove, PlayerStats
 from chat.models import PrivateChat
 import json
 import logging
@@ -283,21 +283,19 @@ def abandon_room_caro_game(request, room_name):
 def get_game_stats(request):
     """Get user's Caro game statistics"""
     try:
-        # Get all game stats (all are room games now)
-        total_games_won = CaroGame.objects.filter(winner=request.user).count()
-        total_games_played = CaroGame.objects.filter(
-            Q(player1=request.user) | Q(player2=request.user),
-            status='finished'
-        ).count()
-        
-        win_rate = (total_games_won / total_games_played * 100) if total_games_played > 0 else 0
+        # Materialized per-player totals (updated when games are settled)
+        player_stats = PlayerStats.for_user(request.user)
+        total_games_won = player_stats.games_won
+        total_games_played = player_stats.games_played
+        win_rate = player_stats.win_rate
         
         return JsonResponse({
             'success': True,
             'stats': {
                 'total_games_played': total_games_played,
                 'total_games_won': total_games_won,
-                'win_rate': round(win_rate, 1)
+                'win_rate': round(win_rate, 1),
+                'rating': round(player_stats.rating)
             }
         })
     except Exception as e:
@@ -11,6 +11,7 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from .models import UserProfile, PrivateChat, PrivateMessage, Room, Message
+from .presence import heartbeat
 from .serializers import (
     UserSerializer, UserProfileSerializer, PrivateChatSerializer,
     PrivateMessageSerializer, PrivateMessageCreateSerializer,
@@ -242,7 +243,6 @@ class UpdateActivityAPIView(APIView):
     
     def post(self, request):
         """Update user's last activity"""
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
-        profile.is_online = True
-        profile.save()
+        # Cache-only heartbeat; the profile row is written on online/offline transitions
+        heartbeat(request.user)
         return Response({'status': 'activity updated'})
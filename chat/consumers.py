@@ -3,6 +3,7 @@ from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
 from django.utils import timezone
 from .models import Room, Message
+from .presence import start_keepalive
 from caro_game.models import CaroGame
 import json
 import logging
@@ -24,9 +25,11 @@ class HomeConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         
-        # Mark user as online if authenticated
+        # Mark user as online if authenticated (other tabs may already count)
+        came_online = False
         if self.scope['user'] and self.scope['user'].is_authenticated:
-            await self.update_user_online_status(True)
+            came_online = await self.register_connection()
+            self.presence_keepalive = start_keepalive(lambda: self.update_user_online_status(True))
         
         # Send current rooms list and online users on connect
         rooms = await self.get_rooms()
@@ -48,20 +51,7 @@ class HomeConsumer(AsyncWebsocketConsumer):
         }))
         
         # Broadcast to other users that someone came online
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_status_changed',
-                'user_id': self.scope['user'].id if self.scope['user'].is_authenticated else None
-            }
-        )
-    
-    async def disconnect(self, close_code):
-        # Mark user as offline if authenticated
-        if self.scope['user'] and self.scope['user'].is_authenticated:
-            await self.update_user_online_status(False)
-            
-            # Broadcast to other users that someone went offline
+        if came_online:
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
@@ -69,6 +59,24 @@ class HomeConsumer(AsyncWebsocketConsumer):
                     'user_id': self.scope['user'].id
                 }
             )
+    
+    async def disconnect(self, close_code):
+        if getattr(self, 'presence_keepalive', None):
+            self.presence_keepalive.cancel()
+        
+        # Mark user as offline once their last connection closes
+        if self.scope['user'] and self.scope['user'].is_authenticated:
+            went_offline = await self.unregister_connection()
+            
+            # Broadcast to other users that someone went offline
+            if went_offline:
+                await self.channel_layer.group_send(
+                    self.room_group_name,
+                    {
+                        'type': 'user_status_changed',
+                        'user_id': self.scope['user'].id
+                    }
+                )
         
         # Leave home updates group
         await self.channel_layer.group_discard(
@@ -82,7 +90,11 @@ class HomeConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             message_type = data.get('type')
             
-            if message_type == 'get_rooms':
+            if message_type == 'heartbeat':
+                # Keep presence alive; only a state transition touches the database
+                if self.scope['user'] and self.scope['user'].is_authenticated:
+                    await self.update_user_online_status(True)
+            elif message_type == 'get_rooms':
                 rooms = await self.get_rooms()
                 await self.send(text_data=json.dumps({
                     'type': 'rooms_list',
@@ -119,20 +131,38 @@ class HomeConsumer(AsyncWebsocketConsumer):
             'room_data': room_data
         }))
     
+    @database_sync_to_async
+    def register_connection(self):
+        """Count this socket towards the user's presence; True if they came online"""
+        try:
+            from .presence import connect
+            return connect(self.scope['user'])
+        except Exception as e:
+            logger.error(f"Error registering presence connection: {e}")
+            return False
+    
+    @database_sync_to_async
+    def unregister_connection(self):
+        """Release this socket; True if it was the user's last connection"""
+        try:
+            from .presence import disconnect
+            return disconnect(self.scope['user'])
+        except Exception as e:
+            logger.error(f"Error unregistering presence connection: {e}")
+            return False
+    
     @database_sync_to_async
     def update_user_online_status(self, is_online):
         """Update user's online status in cache"""
         try:
-            from django.core.cache import cache
-            import time
+            from .presence import heartbeat, set_online_status
             
-            if self.scope['user'] and self.scope['user'].is_authenticated:
-                user_online_key = f"user_{self.scope['user'].id}_last_seen"
-                
+            user = self.scope['user']
+            if user and user.is_authenticated:
                 if is_online:
-                    cache.set(user_online_key, time.time(), timeout=300)  # 5 minutes
+                    heartbeat(user)
                 else:
-                    cache.delete(user_online_key)
+                    set_online_status(user.id, False, username=user.username)
                     
         except Exception as e:
             logger.error(f"Error updating user online status: {e}")
@@ -306,6 +336,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }))
 
     async def disconnect(self, close_code):
+        if getattr(self, 'presence_keepalive', None):
+            self.presence_keepalive.cancel()
+        
         # Remove user from online users and notify others
         if hasattr(self, 'user') and self.user.is_authenticated:
             await self.remove_user_from_room()
@@ -457,14 +490,17 @@ class ChatConsumer(AsyncWebsocketConsumer):
     # Online Users Tracking Methods
     async def add_user_to_room(self):
         """Add user to online users list and notify room"""
-        online_users = await self.get_online_users()
-        
-        # Add current user if not already in list
-        if self.user.username not in [user['username'] for user in online_users]:
-            await self.set_user_online()
+        first_in_room = await self.register_connection()
+        await self.set_user_online()
+        # Refresh global and room presence while the socket stays open
+        self.presence_keepalive = start_keepalive(self.set_user_online)
             
         # Track that user has joined this room for future visibility
         await self.track_user_joined_room()
+        
+        # Another tab already announced this user in the room
+        if not first_in_room:
+            return
             
         # Get updated list and broadcast
         online_users = await self.get_online_users()
@@ -478,6 +514,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         logger.info(f"User {self.user.username} joined room {self.room_name}")
 
+    @database_sync_to_async
+    def register_connection(self):
+        """Count this socket for the room and the user's global presence"""
+        from .presence import connect, join_room
+        
+        connect(self.user)
+        return join_room(self.room_name, self.user)
+    
+    @database_sync_to_async
+    def unregister_connection(self):
+        """Release this socket; True if it was the user's last one in the room"""
+        from .presence import disconnect, leave_room
+        
+        disconnect(self.user)
+        return leave_room(self.room_name, self.user)
+
     @database_sync_to_async
     def track_user_joined_room(self):
         """Track that user has joined this room for visibility purposes"""
@@ -499,6 +551,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def remove_user_from_room(self):
         """Remove user from online users list and notify room"""
+        # Keep the user listed while another tab is still in the room
+        if not await self.unregister_connection():
+            return
+        
         await self.set_user_offline()
         
         # Get updated list and broadcast
@@ -554,8 +610,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
     def set_user_online(self):
         """Mark user as online in this room"""
         from django.core.cache import cache
+        from .presence import heartbeat, touch_room
         import time
         
+        # Room activity keeps the user's global presence alive too
+        heartbeat(self.user)
+        touch_room(self.room_name, self.user)
+        
         online_users_key = f"room_{self.room_name}_online_users"
         online_users = cache.get(online_users_key, {})
         online_users[self.user.username] = time.time()
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.presence import cache_is_shared, flush_last_seen, reap_stale_presence, PRESENCE_FLUSH_INTERVAL
+
+
+class Command(BaseCommand):
+    help = 'Mark users offline whose presence heartbeat has expired (crashed workers, dropped sockets)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and sweep every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=PRESENCE_FLUSH_INTERVAL,
+            help=f'Seconds between sweeps in --loop mode (default: {PRESENCE_FLUSH_INTERVAL})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of online profiles checked per UPDATE (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            # A per-process cache holds no heartbeats here, so every user would look stale
+            raise CommandError(
+                'reap_presence needs a cache shared with the web workers (set REDIS_URL); '
+                'the configured cache is local to this process'
+            )
+
+        interval = options['interval']
+        batch_size = options['batch_size']
+
+        while True:
+            self.sweep(batch_size)
+            if not options['loop']:
+                break
+            time.sleep(interval)
+
+    def sweep(self, batch_size):
+        """Persist pending last_seen values, then clear stale online flags"""
+        flushed = flush_last_seen(batch_size=batch_size)
+        reaped = reap_stale_presence(batch_size=batch_size)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Flushed last_seen for {flushed} users, marked {len(reaped)} stale users offline")
+        )
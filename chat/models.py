@@ -34,6 +34,13 @@ class UserProfile(models.Model):
     def __str__(self):
         return f'{self.user.username} Profile'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored presence so post_save can detect real transitions
+        instance._loaded_is_online = instance.__dict__.get('is_online')
+        return instance
+    
     @property
     def win_rate(self):
         """Calculate win rate percentage"""
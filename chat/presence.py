@@ -0,0 +1,331 @@
+"""
+Presence tracking for Love Chat
+
+Heartbeats only refresh the user's ``user_{id}_last_seen`` cache key. The
+database is written when the online/offline state actually flips, and
+``UserProfile.last_seen`` is persisted in batched flushes by the
+background ``manage.py reap_presence --loop`` command.
+
+Every open socket is counted, so a user with several tabs only goes
+offline when the last of them disconnects. While a socket is open the
+consumer refreshes the heartbeat itself (start_keepalive), so idle tabs
+are not reaped; clients may also send ``{"type": "heartbeat"}``.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TIMEOUT = getattr(settings, 'PRESENCE_TIMEOUT', 300)  # 5 minutes
+PRESENCE_FLUSH_INTERVAL = getattr(settings, 'PRESENCE_FLUSH_INTERVAL', 60)
+PRESENCE_KEEPALIVE_INTERVAL = getattr(settings, 'PRESENCE_KEEPALIVE_INTERVAL', PRESENCE_TIMEOUT / 3)
+
+# Per-process caches: another process (e.g. the reaper) cannot see their heartbeats
+LOCAL_CACHE_BACKENDS = ('django.core.cache.backends.locmem', 'django.core.cache.backends.dummy')
+
+
+def last_seen_key(user_id):
+    """Cache key holding the user's last heartbeat timestamp"""
+    return f"user_{user_id}_last_seen"
+
+
+def connections_key(user_id):
+    """Cache key holding the number of open sockets for the user"""
+    return f"user_{user_id}_connections"
+
+
+def room_connections_key(room_name, user_id):
+    """Cache key holding the number of open sockets for the user in a chat room"""
+    return f"room_{room_name}_user_{user_id}_connections"
+
+
+def cache_is_shared():
+    """True when heartbeats written by one process are visible to the others"""
+    return type(caches['default']).__module__ not in LOCAL_CACHE_BACKENDS
+
+
+def start_keepalive(refresh):
+    """
+    Call ``refresh`` (a coroutine function) every PRESENCE_KEEPALIVE_INTERVAL.
+
+    Consumers start this once the socket is registered and cancel the
+    returned task on disconnect, so an open but idle tab stays online.
+    """
+    async def run():
+        while True:
+            await asyncio.sleep(PRESENCE_KEEPALIVE_INTERVAL)
+            try:
+                await refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing presence: {e}")
+
+    return asyncio.ensure_future(run())
+
+
+def get_last_seen(user_id):
+    """Return the user's last heartbeat timestamp, or None if expired"""
+    last_seen = cache.get(last_seen_key(user_id))
+    if last_seen and time.time() - last_seen < PRESENCE_TIMEOUT:
+        return last_seen
+    return None
+
+
+def heartbeat(user):
+    """
+    Refresh a user's presence in the cache.
+
+    Only the first heartbeat after the user went offline touches the
+    database (and broadcasts); every other heartbeat is a cache write.
+    """
+    was_online = get_last_seen(user.id) is not None
+    cache.set(last_seen_key(user.id), time.time(), timeout=PRESENCE_TIMEOUT)
+    # The socket refcount lives as long as heartbeats keep coming
+    cache.touch(connections_key(user.id), timeout=PRESENCE_TIMEOUT)
+
+    if not was_online:
+        set_online_status(user.id, True, username=user.username)
+
+
+def set_online_status(user_id, is_online, username=None):
+    """
+    Persist an online/offline transition and broadcast it.
+
+    The conditional UPDATE only matches when the stored state differs, so
+    repeated calls are no-ops and only the caller that flips the flag
+    sends the ``chat.user_status`` notification.
+    """
+    from .models import UserProfile
+    from .realtime_helpers import notify_user_online_status
+
+    if not is_online:
+        cache.delete(last_seen_key(user_id))
+
+    updates = {'is_online': is_online}
+    if not is_online:
+        updates['last_seen'] = timezone.now()
+
+    changed = UserProfile.objects.filter(
+        user_id=user_id,
+        is_online=not is_online
+    ).update(**updates)
+    if not changed and is_online:
+        # Users created before profiles existed come online with a new row
+        _, changed = UserProfile.objects.get_or_create(user_id=user_id, defaults={'is_online': True})
+
+    if changed:
+        if username is None:
+            from django.contrib.auth.models import User
+            username = User.objects.filter(id=user_id).values_list('username', flat=True).first()
+        notify_user_online_status(user_id=user_id, is_online=is_online, username=username)
+
+    return bool(changed)
+
+
+def connect(user):
+    """
+    Register one open socket for the user.
+
+    Returns True when this is the user's first connection, i.e. when the
+    user actually came online.
+    """
+    first = _incr_connections(connections_key(user.id), timeout=PRESENCE_TIMEOUT) == 1
+    heartbeat(user)
+    return first
+
+
+def disconnect(user):
+    """
+    Unregister one socket for the user.
+
+    The user is only marked offline (and the change broadcast) when the
+    last connection closes. Returns True in that case.
+    """
+    if _decr_connections(connections_key(user.id)) > 0:
+        return False
+
+    set_online_status(user.id, False, username=user.username)
+    return True
+
+
+def join_room(room_name, user):
+    """Count a socket in a chat room; True when it is the user's first there"""
+    return _incr_connections(room_connections_key(room_name, user.id), timeout=PRESENCE_TIMEOUT) == 1
+
+
+def touch_room(room_name, user):
+    """Keep the user's room refcount alive alongside their heartbeat"""
+    cache.touch(room_connections_key(room_name, user.id), timeout=PRESENCE_TIMEOUT)
+
+
+def leave_room(room_name, user):
+    """Release a socket in a chat room; True when the user's last one there closed"""
+    return _decr_connections(room_connections_key(room_name, user.id)) <= 0
+
+
+def _incr_connections(key, timeout=None):
+    """Atomically increment a connection refcount and return the new value"""
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key evicted (or expired) between add and incr
+        cache.set(key, 1, timeout=timeout)
+        return 1
+
+
+def _decr_connections(key):
+    """Atomically decrement a connection refcount, deleting it at zero"""
+    try:
+        count = cache.decr(key)
+    except ValueError:
+        # Refcount already gone, e.g. expired after heartbeats stopped
+        return 0
+
+    if count <= 0:
+        cache.delete(key)
+    return count
+
+
+def flush_last_seen(batch_size=500):
+    """Copy cached heartbeat timestamps of online users to UserProfile.last_seen"""
+    from .models import UserProfile
+
+    profiles = UserProfile.objects.filter(is_online=True).only('id', 'user_id', 'last_seen')
+
+    flushed = 0
+    batch = []
+    for profile in profiles.iterator(chunk_size=batch_size):
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            flushed += _flush_batch(batch, batch_size)
+            batch = []
+    if batch:
+        flushed += _flush_batch(batch, batch_size)
+
+    if flushed:
+        logger.debug(f"Flushed last_seen for {flushed} users")
+    return flushed
+
+
+def _flush_batch(profiles, batch_size):
+    """Write cached heartbeats for one batch of profiles with a single UPDATE"""
+    from .models import UserProfile
+
+    keys = {last_seen_key(profile.user_id): profile for profile in profiles}
+    cached = cache.get_many(list(keys))
+
+    dirty = []
+    for key, timestamp in cached.items():
+        profile = keys[key]
+        last_seen = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+        if profile.last_seen is None or last_seen > profile.last_seen:
+            profile.last_seen = last_seen
+            dirty.append(profile)
+
+    if dirty:
+        # bulk_update bypasses auto_now, so the cached timestamp is stored as-is
+        UserProfile.objects.bulk_update(dirty, ['last_seen'], batch_size=batch_size)
+    return len(dirty)
+
+
+def reap_stale_presence(batch_size=500):
+    """
+    Mark users offline whose heartbeat has expired.
+
+    Covers users left "online" by a crashed worker or a dropped socket that
+    never reached disconnect(). Each batch is cleared with one bulk UPDATE,
+    stale users are removed from the room presence dicts, and a single
+    aggregated offline notification is sent for the whole sweep.
+    """
+    from .models import UserProfile
+
+    profiles = UserProfile.objects.filter(is_online=True).values_list('id', 'user_id', 'user__username')
+
+    reaped = []
+    batch = []
+    for row in profiles.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            reaped.extend(_reap_batch(batch))
+            batch = []
+    if batch:
+        reaped.extend(_reap_batch(batch))
+
+    if reaped:
+        _remove_from_room_presence(reaped)
+
+        from .realtime_helpers import notify_users_offline
+        notify_users_offline(reaped)
+        logger.info(f"Presence reaper marked {len(reaped)} users offline")
+
+    return reaped
+
+
+def _reap_batch(rows):
+    """Clear is_online for the stale users of one batch with a single UPDATE"""
+    from .models import UserProfile
+
+    cached = cache.get_many([last_seen_key(user_id) for _, user_id, _ in rows])
+    now = time.time()
+
+    stale = [
+        (profile_id, user_id, username)
+        for profile_id, user_id, username in rows
+        if now - cached.get(last_seen_key(user_id), 0) >= PRESENCE_TIMEOUT
+    ]
+    if not stale:
+        return []
+
+    UserProfile.objects.filter(
+        id__in=[profile_id for profile_id, _, _ in stale],
+        is_online=True
+    ).update(is_online=False)
+
+    # A heartbeat racing with the sweep then sees no key and flips the user
+    # back online instead of staying hidden behind a fresh cache entry.
+    # The global socket refcount is left alone: it expires by itself once
+    # no heartbeat refreshes it (e.g. after a worker crash), and deleting
+    # it here would break the count for tabs that are still open.
+    cache.delete_many([last_seen_key(user_id) for _, user_id, _ in stale])
+
+    return [(user_id, username) for _, user_id, username in stale]
+
+
+def _remove_from_room_presence(reaped):
+    """
+    Drop reaped users from the per-room ``room_{name}_online_users`` dicts,
+    and clear their room refcounts so their next join is announced again.
+    """
+    from .models import Room
+
+    room_names = list(Room.objects.values_list('name', flat=True))
+    if not room_names:
+        return
+
+    cache.delete_many([
+        room_connections_key(name, user_id)
+        for name in room_names
+        for user_id, _ in reaped
+    ])
+
+    usernames = {username for _, username in reaped}
+    keys = [f"room_{name}_online_users" for name in room_names]
+
+    updated = {}
+    for key, online_users in cache.get_many(keys).items():
+        remaining = {
+            username: last_seen
+            for username, last_seen in online_users.items()
+            if username not in usernames
+        }
+        if remaining != online_users:
+            updated[key] = remaining
+
+    if updated:
+        cache.set_many(updated, timeout=PRESENCE_TIMEOUT)
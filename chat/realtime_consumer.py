@@ -77,6 +77,10 @@ class RealtimeConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             event_type = data.get('type')
             
+            if event_type == 'wallet.sync':
+                await self.sync_wallet(data.get('version'))
+                return
+            
             # Handle different event types if needed
             print(f"📨 Received from {self.user.username}: {event_type}")
             
@@ -85,6 +89,18 @@ class RealtimeConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             print(f"❌ Error in receive: {e}")
 
+    async def sync_wallet(self, version):
+        """Reply with the wallet balance only if the client's version is out of date"""
+        from user_wallet import balances
+        
+        current = await database_sync_to_async(balances.get_balance)(self.user.id)
+        if current is None or current.version == version:
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'wallet.updated',
+            'data': {'balance': current.balance, 'version': current.version},
+        }))
+
     # Event handlers for different update types
     
     async def wallet_updated(self, event):
@@ -135,6 +151,14 @@ class RealtimeConsumer(AsyncWebsocketConsumer):
             'timestamp': event.get('timestamp')
         }))
 
+    async def caro_match_found(self, event):
+        """Send quick match found notification"""
+        await self.send(text_data=json.dumps({
+            'type': 'caro.match_found',
+            'data': event['data'],
+            'timestamp': event.get('timestamp')
+        }))
+
     async def caro_game_move(self, event):
         """Send game move notification"""
         await self.send(text_data=json.dumps({
@@ -159,6 +183,14 @@ class RealtimeConsumer(AsyncWebsocketConsumer):
             'timestamp': event.get('timestamp')
         }))
 
+    async def chat_users_offline(self, event):
+        """Send batched offline status change"""
+        await self.send(text_data=json.dumps({
+            'type': 'chat.users_offline',
+            'data': event['data'],
+            'timestamp': event.get('timestamp')
+        }))
+
     async def chat_private_message(self, event):
         """Send new private message notification"""
         await self.send(text_data=json.dumps({
@@ -44,26 +44,8 @@ def send_realtime_update(event_type: str, data: dict, user_id=None, broadcast=Fa
         print(f"❌ Error sending realtime update: {e}")
 
 
-def notify_wallet_updated(user_id: int, balance: float, transaction=None):
-    """Notify user that their wallet was updated"""
-    data = {
-        'balance': balance,
-    }
-    if transaction:
-        data['transaction'] = {
-            'id': transaction.id,
-            'amount': float(transaction.amount),
-            'transaction_type': transaction.transaction_type,
-            'description': transaction.description,
-            'created_at': transaction.created_at.isoformat(),
-        }
-    
-    send_realtime_update('wallet.updated', data, user_id=user_id)
-
-
-def notify_wallet_transaction(user_id: int, transaction):
-    """Notify user of a new transaction"""
-    data = {
+def _wallet_transaction_data(transaction):
+    return {
         'id': transaction.id,
         'amount': float(transaction.amount),
         'transaction_type': transaction.transaction_type,
@@ -71,8 +53,20 @@ def notify_wallet_transaction(user_id: int, transaction):
         'balance_after': float(transaction.balance_after) if transaction.balance_after else None,
         'created_at': transaction.created_at.isoformat(),
     }
+
+
+def notify_wallet_entries(user_id: int, balance: float, transactions, version: int = None):
+    """Notify user once for a batch of ledger entries (final balance + all entries)"""
+    data = {
+        'balance': balance,
+        'version': version,
+        'transactions': [_wallet_transaction_data(transaction) for transaction in transactions],
+    }
+    if transactions:
+        # Same shape as a single-entry wallet.updated for older clients
+        data['transaction'] = data['transactions'][-1]
     
-    send_realtime_update('wallet.transaction', data, user_id=user_id)
+    send_realtime_update('wallet.updated', data, user_id=user_id)
 
 
 def notify_caro_room_created(room):
@@ -111,6 +105,30 @@ def notify_user_online_status(user_id: int, is_online: bool, username: str):
     send_realtime_update('chat.user_status', data, broadcast=True)
 
 
+def notify_users_offline(users):
+    """Notify all users that several users went offline at once"""
+    data = {
+        'users': [
+            {'user_id': user_id, 'username': username}
+            for user_id, username in users
+        ],
+        'is_online': False,
+        'timestamp': datetime.now().isoformat()
+    }
+    send_realtime_update('chat.users_offline', data, broadcast=True)
+
+    # Let the home page refresh its online list once for the whole batch
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        try:
+            async_to_sync(channel_layer.group_send)(
+                'home_updates',
+                {'type': 'user_status_changed', 'user_id': None}
+            )
+        except Exception as e:
+            print(f"❌ Error sending home presence update: {e}")
+
+
 def notify_caro_game_started(room):
     """Notify players that game started"""
     from caro_game.serializers import CaroGameSerializer
@@ -124,6 +142,16 @@ def notify_caro_game_started(room):
         send_realtime_update('caro.game_started', data, user_id=room.player2.id)
 
 
+def notify_caro_match_found(room):
+    """Notify both players that quick match paired them into a game"""
+    from caro_game.serializers import CaroGameSerializer
+    
+    data = CaroGameSerializer(room).data
+    
+    send_realtime_update('caro.match_found', data, user_id=room.player1.id)
+    send_realtime_update('caro.match_found', data, user_id=room.player2.id)
+
+
 def notify_caro_game_move(room, move):
     """Notify players of a new move"""
     from caro_game.serializers import CaroGameSerializer
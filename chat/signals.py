@@ -39,13 +39,15 @@ def create_user_wallet(sender, instance, created, **kwargs):
         
         # Create initial transaction record
         from user_wallet.models import WalletTransaction
-        WalletTransaction.objects.create(
+        from user_wallet import rollups
+        initial = WalletTransaction.objects.create(
             wallet=wallet,
             transaction_type='initial',
             amount=100000,
             balance_after=100000,
             description='Welcome bonus - Initial balance'
         )
+        rollups.record([initial])
         
         logger.info(f"Wallet created for user {instance.username} with 100,000 đồng")
 
@@ -122,36 +124,26 @@ def room_created_signal(sender, instance, created, **kwargs):
 @receiver(post_save, sender=UserProfile)
 def user_profile_status_updated(sender, instance, created, **kwargs):
     """Notify when user online status changes"""
-    if not created:
-        # Notify all users about status change
-        notify_user_online_status(
-            user_id=instance.user.id,
-            is_online=instance.is_online,
-            username=instance.user.username
-        )
-
-
-@receiver(post_save, sender=PrivateMessage)
-def private_message_notification(sender, instance, created, **kwargs):
-    """Notify when new private message is created"""
     if created:
-        notify_private_message(instance)
-
-
-@receiver(post_save, sender=UserProfile)
-def user_profile_status_updated(sender, instance, created, **kwargs):
-    """Notify when user online status changes"""
-    if not created:
-        # Notify all users about status change
-        notify_user_online_status(
-            user_id=instance.user.id,
-            is_online=instance.is_online,
-            username=instance.user.username
-        )
+        instance._loaded_is_online = instance.is_online
+        return
+    
+    # Ordinary profile saves (message counters, bio edits...) keep the same
+    # presence and must not broadcast to every connected user
+    if getattr(instance, '_loaded_is_online', None) == instance.is_online:
+        return
+    instance._loaded_is_online = instance.is_online
+    
+    # Notify all users about status change
+    notify_user_online_status(
+        user_id=instance.user_id,
+        is_online=instance.is_online,
+        username=instance.user.username
+    )
 
 
 @receiver(post_save, sender=PrivateMessage)
 def private_message_notification(sender, instance, created, **kwargs):
     """Notify when new private message is created"""
     if created:
-        notify_private_message(instance)
\ No newline at end of file
+        notify_private_message(instance)
@@ -10,7 +10,8 @@ from django.db import transaction
 from django.db.models import Q
 from django.core.cache import cache
 from .models import Room, Message, PrivateChat, PrivateMessage
-from caro_game.models import CaroGame
+from .presence import heartbeat
+from caro_game.models import PlayerStats
 import json
 import logging
 import time
@@ -73,11 +74,9 @@ def profile(request):
     message_count = PrivateMessage.objects.filter(sender=request.user).count()
     
     # Get Caro game stats
-    games_won = CaroGame.objects.filter(winner=request.user).count()
-    games_played = CaroGame.objects.filter(
-        Q(player1=request.user) | Q(player2=request.user),
-        status='finished'
-    ).count()
+    caro_stats = PlayerStats.for_user(request.user)
+    games_won = caro_stats.games_won
+    games_played = caro_stats.games_played
     
     context = {
         'user_chats': user_chats,
@@ -257,8 +256,7 @@ def get_online_users(request):
     if request.method == 'GET':
         try:
             # Mark current user as online
-            user_online_key = f"user_{request.user.id}_last_seen"
-            cache.set(user_online_key, time.time(), timeout=300)  # 5 minutes
+            heartbeat(request.user)
             
             # Get all users (excluding current user)
             all_users = User.objects.exclude(id=request.user.id).values('id', 'username')
@@ -304,8 +302,7 @@ def update_user_activity(request):
     if request.method == 'POST':
         try:
             # Mark user as online
-            user_online_key = f"user_{request.user.id}_last_seen"
-            cache.set(user_online_key, time.time(), timeout=300)  # 5 minutes
+            heartbeat(request.user)
             
             return JsonResponse({'success': True})
         except Exception as e:
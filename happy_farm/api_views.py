@@ -3,13 +3,16 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, Prefetch, prefetch_related_objects
 from django.utils import timezone
 
+from love_chat.pagination import KeysetPagination
+
+from . import services
 from .models import Farm, CropType, FarmPlot, FarmTransaction
 from .serializers import (
     FarmSerializer, CropTypeSerializer, FarmPlotSerializer,
-    FarmTransactionSerializer, PlantCropSerializer,
+    FarmTransactionSerializer, PlantCropSerializer, PlantAllSerializer,
     HarvestPlotSerializer, ClearPlotSerializer, FarmStatsSerializer
 )
 
@@ -84,13 +87,16 @@ class FarmViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def my_farm(self, request):
-        """Get current user's farm"""
+        """Get current user's farm (read-only: energy and plot states are derived)"""
         farm = self.get_object()
-        farm.update_energy()  # Update energy before returning
+        now = timezone.now()
+        farm.refresh_energy(now)
         
-        # Update all plot states
+        prefetch_related_objects([farm], Prefetch(
+            'plots', queryset=FarmPlot.objects.select_related('crop_type').order_by('plot_number')
+        ))
         for plot in farm.plots.all():
-            plot.update_state()
+            plot.refresh_state(now)
         
         serializer = self.get_serializer(farm)
         return Response(serializer.data)
@@ -184,39 +190,47 @@ class FarmViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def harvest_all(self, request):
-        """Harvest all ready plots"""
+        """Harvest all ready plots (one transaction, see happy_farm.services)"""
         farm = self.get_object()
-        farm.update_energy()
-        
-        ready_plots = farm.plots.filter(state='ready')
         
-        if not ready_plots.exists():
+        try:
+            result = services.harvest_all(farm)
+        except services.FarmActionError as e:
             return Response({
                 'success': False,
-                'message': 'No plots ready for harvest'
+                'message': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        total_money = 0
-        total_experience = 0
-        harvested_crops = []
+        return Response({
+            'success': True,
+            'message': f'Harvested {len(result["harvested_crops"])} plots',
+            **result
+        })
+
+    @action(detail=False, methods=['post'])
+    def plant_all(self, request):
+        """Plant one crop type in several plots (default: every empty unlocked plot)"""
+        serializer = PlantAllSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
         
-        for plot in ready_plots:
-            success, message, money_earned, experience_gained = plot.harvest()
-            if success:
-                total_money += money_earned
-                total_experience += experience_gained
-                harvested_crops.append({
-                    'plot_number': plot.plot_number,
-                    'money_earned': money_earned,
-                    'experience_gained': experience_gained
-                })
+        crop_type = serializer.validated_data['crop_type']
+        farm = self.get_object()
+        
+        try:
+            result = services.plant_all(farm, crop_type, serializer.validated_data.get('plot_numbers'))
+        except services.FarmActionError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'success': True,
-            'message': f'Harvested {len(harvested_crops)} plots',
-            'total_money': total_money,
-            'total_experience': total_experience,
-            'harvested_crops': harvested_crops
+            'message': f'Planted {crop_type.emoji} {crop_type.name} in {len(result["plots"])} plots',
+            'seeds_cost': result['seeds_cost'],
+            'energy_used': result['energy_used'],
+            'energy': result['farm'].energy,
+            'plots': FarmPlotSerializer(result['plots'], many=True).data
         })
 
     @action(detail=False, methods=['get'])
@@ -238,12 +252,17 @@ class FarmViewSet(viewsets.ModelViewSet):
         ).aggregate(Sum('amount'))['amount__sum'] or 0)
         
         # Current plot states
-        current_planted = farm.plots.filter(state='planted').count()
-        ready_to_harvest = farm.plots.filter(state='ready').count()
-        withered_crops = farm.plots.filter(state='withered').count()
+        plot_counts = farm.plots.with_current_state().aggregate(
+            planted=Count('id', filter=Q(current_state='planted')),
+            ready=Count('id', filter=Q(current_state='ready')),
+            withered=Count('id', filter=Q(current_state='withered')),
+        )
+        current_planted = plot_counts['planted']
+        ready_to_harvest = plot_counts['ready']
+        withered_crops = plot_counts['withered']
         
         # Energy regeneration time
-        energy_needed = farm.max_energy - farm.energy
+        energy_needed = farm.max_energy - farm.refresh_energy()
         energy_regen_time = energy_needed * 5  # 5 minutes per energy point
         
         stats_data = {
@@ -268,18 +287,26 @@ class FarmTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = FarmTransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    # Append-only ledger: fixed (-created_at, -id) order, keyset pages without COUNT
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend]
     filterset_fields = ['transaction_type']
-    ordering_fields = ['amount', 'created_at']
-    ordering = ['-created_at']
 
     def get_queryset(self):
         user = self.request.user
         try:
             farm = user.farm
-            return FarmTransaction.objects.filter(farm=farm)
+            transactions = FarmTransaction.objects.filter(farm=farm).select_related('crop_type')
         except Farm.DoesNotExist:
             return FarmTransaction.objects.none()
+        
+        # ?sign=credit|debit, served by the partial indexes on amount sign
+        sign = self.request.query_params.get('sign')
+        if sign == 'credit':
+            transactions = transactions.filter(amount__gt=0)
+        elif sign == 'debit':
+            transactions = transactions.filter(amount__lt=0)
+        return transactions
 
     @action(detail=False, methods=['get'])
     def recent(self, request):
@@ -291,7 +318,7 @@ class FarmTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def earnings(self, request):
         """Get earning transactions only"""
-        transactions = self.get_queryset().filter(amount__gt=0)
+        transactions = self.filter_queryset(self.get_queryset()).filter(amount__gt=0)
         page = self.paginate_queryset(transactions)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -303,7 +330,7 @@ class FarmTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def expenses(self, request):
         """Get expense transactions only"""
-        transactions = self.get_queryset().filter(amount__lt=0)
+        transactions = self.filter_queryset(self.get_queryset()).filter(amount__lt=0)
         page = self.paginate_queryset(transactions)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
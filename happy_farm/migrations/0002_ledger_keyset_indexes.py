@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('happy_farm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='farmtransaction',
+            name='happy_farm__farm_id_e1b14d_idx',
+        ),
+        migrations.AddIndex(
+            model_name='farmtransaction',
+            index=models.Index(fields=['farm', '-created_at', '-id'], name='happy_farm__farm_id_e4b84c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farmtransaction',
+            index=models.Index(fields=['farm', 'transaction_type', '-created_at', '-id'], name='happy_farm__farm_id_a22e38_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farmtransaction',
+            index=models.Index(condition=models.Q(('amount__gt', 0)), fields=['farm', '-created_at', '-id'], name='farm_txn_credit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farmtransaction',
+            index=models.Index(condition=models.Q(('amount__lt', 0)), fields=['farm', '-created_at', '-id'], name='farm_txn_debit_idx'),
+        ),
+    ]
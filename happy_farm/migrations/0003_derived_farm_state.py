@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('happy_farm', '0002_ledger_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='farm',
+            name='last_energy_update',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -3,11 +3,14 @@ Farm Game Models for Love Chat
 Fun farming game where users can plant crops, earn money, and manage their virtual farm
 """
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 import json
 
+ENERGY_REGEN_MINUTES = 5
+
 
 class Farm(models.Model):
     """User's farm with plots and farm level"""
@@ -16,7 +19,8 @@ class Farm(models.Model):
     experience = models.IntegerField(default=0)
     energy = models.IntegerField(default=100)  # Max 100, regenerates over time
     max_energy = models.IntegerField(default=100)
-    last_energy_update = models.DateTimeField(auto_now=True)
+    # Anchor for regeneration; only moves when regenerated energy is written back
+    last_energy_update = models.DateTimeField(default=timezone.now)
     plots_unlocked = models.IntegerField(default=6)  # Start with 6 plots
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -30,54 +34,64 @@ class Farm(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Farm (Level {self.level})"
     
-    def update_energy(self):
-        """Regenerate energy over time (1 energy per 5 minutes)"""
-        now = timezone.now()
-        time_diff = now - self.last_energy_update
-        minutes_passed = int(time_diff.total_seconds() / 60)
-        
-        if minutes_passed > 0:
-            energy_to_add = minutes_passed // 5  # 1 energy per 5 minutes
-            if energy_to_add > 0:
-                self.energy = min(self.max_energy, self.energy + energy_to_add)
-                self.last_energy_update = now
-                self.save(update_fields=['energy', 'last_energy_update'])
+    def energy_at(self, now=None):
+        """
+        (energy, regeneration anchor) at ``now``, derived from the stored pair.
+
+        1 energy per ENERGY_REGEN_MINUTES; the anchor keeps the unused part
+        of the current interval so nothing is lost when it is written back.
+        """
+        now = now or timezone.now()
+        if self.energy >= self.max_energy:
+            return self.energy, now
         
+        ticks = int((now - self.last_energy_update).total_seconds() // (ENERGY_REGEN_MINUTES * 60))
+        if ticks <= 0:
+            return self.energy, self.last_energy_update
+        if self.energy + ticks >= self.max_energy:
+            return self.max_energy, now
+        return self.energy + ticks, self.last_energy_update + timedelta(minutes=ticks * ENERGY_REGEN_MINUTES)
+    
+    def refresh_energy(self, now=None):
+        """Bring ``energy`` up to date on this instance only (no write)"""
+        self.energy, self.last_energy_update = self.energy_at(now)
         return self.energy
     
     def can_use_energy(self, amount=1):
         """Check if user has enough energy"""
-        self.update_energy()
-        return self.energy >= amount
+        return self.refresh_energy() >= amount
     
     def use_energy(self, amount=1):
         """Use energy and return success"""
         if self.can_use_energy(amount):
             self.energy -= amount
-            self.save(update_fields=['energy'])
+            self.save(update_fields=['energy', 'last_energy_update'])
             return True
         return False
     
     def add_experience(self, amount):
-        """Add experience and handle level up"""
+        """Add experience and handle level up (every level crossed gets its perks)"""
         self.experience += amount
         old_level = self.level
         
         # Level up formula: level = sqrt(experience / 100)
         new_level = int((self.experience / 100) ** 0.5) + 1
         
-        if new_level > old_level:
-            self.level = new_level
+        for level in range(old_level + 1, new_level + 1):
+            self.level = level
             # Unlock more plots every 2 levels
-            if new_level % 2 == 0:
+            if level % 2 == 0:
                 self.plots_unlocked = min(20, self.plots_unlocked + 2)
             
             # Increase max energy every 3 levels
-            if new_level % 3 == 0:
+            if level % 3 == 0:
                 self.max_energy = min(200, self.max_energy + 10)
                 self.energy = self.max_energy  # Full energy on level up
+                self.last_energy_update = timezone.now()
         
-        self.save()
+        self.save(update_fields=[
+            'experience', 'level', 'plots_unlocked', 'max_energy', 'energy', 'last_energy_update', 'updated_at'
+        ])
         return new_level > old_level, new_level
 
 
@@ -112,8 +126,31 @@ class CropType(models.Model):
         return (self.profit * 60) / self.growth_time_minutes
 
 
+class FarmPlotQuerySet(models.QuerySet):
+    """Plot queries on the derived state, see FarmPlot.state_at()"""
+
+    def with_current_state(self, now=None):
+        """Annotate ``current_state``: the stored state advanced to ``now``"""
+        now = now or timezone.now()
+        return self.annotate(current_state=Case(
+            When(Q(state__in=['planted', 'ready'], withers_at__lte=now), then=Value('withered')),
+            When(Q(state='planted', ready_at__lte=now), then=Value('ready')),
+            default=F('state'),
+            output_field=models.CharField(),
+        ))
+
+    def in_state(self, *states, now=None):
+        return self.with_current_state(now).filter(current_state__in=states)
+
+
 class FarmPlot(models.Model):
-    """Individual plot on a farm where crops can be planted"""
+    """
+    Individual plot on a farm where crops can be planted
+
+    ``state`` is only written when the user acts on a plot (plant, harvest,
+    clear). planted -> ready -> withered follow from ready_at/withers_at
+    and are derived on read, see state_at().
+    """
     PLOT_STATES = [
         ('empty', 'Empty'),
         ('planted', 'Planted'),
@@ -129,6 +166,8 @@ class FarmPlot(models.Model):
     ready_at = models.DateTimeField(null=True, blank=True)
     withers_at = models.DateTimeField(null=True, blank=True)
     
+    objects = FarmPlotQuerySet.as_manager()
+    
     class Meta:
         unique_together = ['farm', 'plot_number']
         indexes = [
@@ -158,20 +197,23 @@ class FarmPlot(models.Model):
         
         return True, "Crop planted successfully"
     
-    def update_state(self):
-        """Update plot state based on time"""
-        if self.state == 'planted' and self.ready_at and timezone.now() >= self.ready_at:
-            self.state = 'ready'
-            self.save(update_fields=['state'])
-        elif self.state == 'ready' and self.withers_at and timezone.now() >= self.withers_at:
-            self.state = 'withered'
-            self.save(update_fields=['state'])
-        
+    def state_at(self, now=None):
+        """The plot's state at ``now``, derived from the stored state and timestamps"""
+        now = now or timezone.now()
+        if self.state in ('planted', 'ready') and self.withers_at and now >= self.withers_at:
+            return 'withered'
+        if self.state == 'planted' and self.ready_at and now >= self.ready_at:
+            return 'ready'
+        return self.state
+    
+    def refresh_state(self, now=None):
+        """Bring ``state`` up to date on this instance only (no write)"""
+        self.state = self.state_at(now)
         return self.state
     
     def harvest(self):
         """Harvest the crop and return rewards"""
-        self.update_state()
+        self.refresh_state()
         
         if self.state != 'ready':
             return False, "Crop is not ready to harvest", 0, 0
@@ -251,7 +293,11 @@ class FarmTransaction(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['farm', '-created_at']),
+            # Keyset pages: (farm, created_at, id), optionally by type or amount sign
+            models.Index(fields=['farm', '-created_at', '-id']),
+            models.Index(fields=['farm', 'transaction_type', '-created_at', '-id']),
+            models.Index(fields=['farm', '-created_at', '-id'], condition=models.Q(amount__gt=0), name='farm_txn_credit_idx'),
+            models.Index(fields=['farm', '-created_at', '-id'], condition=models.Q(amount__lt=0), name='farm_txn_debit_idx'),
             models.Index(fields=['transaction_type', '-created_at']),
         ]
     
@@ -18,6 +18,7 @@ class CropTypeSerializer(serializers.ModelSerializer):
 
 class FarmPlotSerializer(serializers.ModelSerializer):
     crop_type = CropTypeSerializer(read_only=True)
+    state = serializers.SerializerMethodField()
     time_until_ready = serializers.SerializerMethodField()
     time_until_withers = serializers.SerializerMethodField()
     
@@ -29,8 +30,13 @@ class FarmPlotSerializer(serializers.ModelSerializer):
             'time_until_ready', 'time_until_withers'
         ]
     
+    def get_state(self, obj):
+        # The stored column is only advanced on writes; derive it at read time
+        current_state = getattr(obj, 'current_state', None)
+        return current_state or obj.state_at()
+    
     def get_time_until_ready(self, obj):
-        if obj.state != 'planted' or not obj.ready_at:
+        if self.get_state(obj) != 'planted' or not obj.ready_at:
             return None
         
         time_left = obj.ready_at - timezone.now()
@@ -40,7 +46,7 @@ class FarmPlotSerializer(serializers.ModelSerializer):
         return int(time_left.total_seconds())
     
     def get_time_until_withers(self, obj):
-        if obj.state != 'ready' or not obj.withers_at:
+        if self.get_state(obj) != 'ready' or not obj.withers_at:
             return None
         
         time_left = obj.withers_at - timezone.now()
@@ -53,6 +59,7 @@ class FarmPlotSerializer(serializers.ModelSerializer):
 class FarmSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     plots = FarmPlotSerializer(many=True, read_only=True)
+    energy = serializers.SerializerMethodField()
     energy_percentage = serializers.SerializerMethodField()
     experience_to_next_level = serializers.SerializerMethodField()
     
@@ -68,10 +75,14 @@ class FarmSerializer(serializers.ModelSerializer):
             'plots_unlocked', 'created_at', 'updated_at'
         ]
     
+    def get_energy(self, obj):
+        # Regenerated energy is derived, not written back on reads
+        return obj.energy_at()[0]
+    
     def get_energy_percentage(self, obj):
         if obj.max_energy == 0:
             return 0
-        return (obj.energy / obj.max_energy) * 100
+        return (self.get_energy(obj) / obj.max_energy) * 100
     
     def get_experience_to_next_level(self, obj):
         next_level_exp = ((obj.level) ** 2) * 100
@@ -143,6 +154,27 @@ class PlantCropSerializer(serializers.Serializer):
         return attrs
 
 
+class PlantAllSerializer(serializers.Serializer):
+    crop_type_id = serializers.IntegerField()
+    plot_numbers = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=19),
+        required=False,
+        allow_empty=False,
+        max_length=20
+    )
+    
+    def validate_crop_type_id(self, value):
+        try:
+            crop_type = CropType.objects.get(id=value)
+            return crop_type
+        except CropType.DoesNotExist:
+            raise serializers.ValidationError("Invalid crop type")
+    
+    def validate(self, attrs):
+        attrs['crop_type'] = attrs['crop_type_id']
+        return attrs
+
+
 class HarvestPlotSerializer(serializers.Serializer):
     plot_number = serializers.IntegerField(min_value=0, max_value=19)
     
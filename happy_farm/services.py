@@ -0,0 +1,183 @@
+"""
+Set-based farm actions
+
+harvest_all() and plant_all() act on many plots in one transaction with
+a fixed number of statements, whatever the plot count: the farm row is
+locked, the plots are read once and written back with one bulk_update,
+the FarmTransactions go in with one bulk_create, and the money moves as
+a single ledger posting (user_wallet.ledger).
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from user_wallet import ledger
+from user_wallet.models import Wallet
+
+from .models import Farm, FarmPlot, FarmTransaction
+
+logger = logging.getLogger(__name__)
+
+PLOT_FIELDS = ['crop_type', 'state', 'planted_at', 'ready_at', 'withers_at']
+
+
+class FarmActionError(ValueError):
+    """The action cannot be applied; the message is safe to show the user"""
+
+
+def _wallet_id(farm):
+    return Wallet.objects.filter(user_id=farm.user_id).values_list('pk', flat=True).get()
+
+
+def harvest_all(farm, now=None):
+    """
+    Harvest every plot that is ready at ``now``.
+
+    Returns a dict with total_money, total_experience, harvested_crops,
+    leveled_up and level. Raises FarmActionError when nothing is ready.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        farm = Farm.objects.select_for_update().get(pk=farm.pk)
+        plots = list(
+            farm.plots.in_state('ready', now=now)
+            .filter(crop_type__isnull=False)
+            .select_related('crop_type')
+            .select_for_update(of=('self',))
+            .order_by('plot_number')
+        )
+        if not plots:
+            raise FarmActionError('No plots ready for harvest')
+
+        total_money = 0
+        total_experience = 0
+        harvested_crops = []
+        farm_transactions = []
+        for plot in plots:
+            crop_type = plot.crop_type
+            total_money += crop_type.sell_price
+            total_experience += crop_type.experience_reward
+            harvested_crops.append({
+                'plot_number': plot.plot_number,
+                'crop': crop_type.name,
+                'money_earned': crop_type.sell_price,
+                'experience_gained': crop_type.experience_reward
+            })
+            farm_transactions.append(FarmTransaction(
+                farm=farm,
+                transaction_type='crop_harvest',
+                amount=crop_type.sell_price,
+                crop_type=crop_type,
+                description=f'Harvested {crop_type.name} from plot {plot.plot_number}'
+            ))
+            plot.crop_type = None
+            plot.state = 'empty'
+            plot.planted_at = plot.ready_at = plot.withers_at = None
+
+        FarmPlot.objects.bulk_update(plots, PLOT_FIELDS)
+        FarmTransaction.objects.bulk_create(farm_transactions)
+        if total_money:
+            ledger.credit(
+                _wallet_id(farm),
+                total_money,
+                'farm_harvest',
+                f'Harvested {len(plots)} crops from farm'
+            )
+        leveled_up, level = farm.add_experience(total_experience)
+
+    logger.info(f"Farm {farm.pk} harvested {len(plots)} plots for {total_money:,} đồng")
+    return {
+        'total_money': total_money,
+        'total_experience': total_experience,
+        'harvested_crops': harvested_crops,
+        'leveled_up': leveled_up,
+        'level': level,
+    }
+
+
+def plant_all(farm, crop_type, plot_numbers=None, now=None):
+    """
+    Plant ``crop_type`` in the given unlocked plots (default: every empty one).
+
+    All or nothing: the farm must have the level, the energy and the money
+    for every plot. Returns a dict with the planted plots, seeds_cost and
+    energy_used. Raises FarmActionError otherwise.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        farm = Farm.objects.select_for_update().get(pk=farm.pk)
+        if farm.level < crop_type.min_level_required:
+            raise FarmActionError(f'Farm level {crop_type.min_level_required} required to plant {crop_type.name}')
+
+        unlocked = range(farm.plots_unlocked)
+        wanted = set(unlocked) if plot_numbers is None else set(plot_numbers)
+        locked_out = sorted(wanted.difference(unlocked))
+        if locked_out:
+            raise FarmActionError(f'Plots not unlocked yet: {locked_out}')
+
+        plots = {
+            plot.plot_number: plot
+            for plot in farm.plots.select_for_update().filter(plot_number__in=wanted)
+        }
+        missing = [FarmPlot(farm=farm, plot_number=number, state='empty') for number in wanted.difference(plots)]
+        if missing:
+            # Plots unlocked by a level-up have no row until first used
+            FarmPlot.objects.bulk_create(missing, ignore_conflicts=True)
+            plots.update((plot.plot_number, plot) for plot in farm.plots.filter(
+                plot_number__in=[plot.plot_number for plot in missing]
+            ))
+
+        plots = sorted((plot for plot in plots.values() if plot.state == 'empty'), key=lambda plot: plot.plot_number)
+        if not plots:
+            raise FarmActionError('No empty plots to plant')
+        if plot_numbers is not None and len(plots) < len(wanted):
+            busy = sorted(wanted.difference(plot.plot_number for plot in plots))
+            raise FarmActionError(f'Plots are not empty: {busy}')
+
+        energy_used = crop_type.energy_cost * len(plots)
+        if farm.refresh_energy(now) < energy_used:
+            raise FarmActionError(f'Not enough energy. Required: {energy_used}, Available: {farm.energy}')
+
+        seeds_cost = crop_type.seed_price * len(plots)
+        if seeds_cost:
+            try:
+                ledger.debit(
+                    _wallet_id(farm),
+                    seeds_cost,
+                    'farm_seeds',
+                    f'Bought {len(plots)} {crop_type.name} seeds'
+                )
+            except ledger.InsufficientBalance as e:
+                raise FarmActionError(str(e))
+
+        ready_at = now + timedelta(minutes=crop_type.growth_time_minutes)
+        for plot in plots:
+            plot.crop_type = crop_type
+            plot.state = 'planted'
+            plot.planted_at = now
+            plot.ready_at = ready_at
+            plot.withers_at = ready_at + timedelta(hours=24)  # Crops wither after 24h
+        FarmPlot.objects.bulk_update(plots, PLOT_FIELDS)
+        FarmTransaction.objects.bulk_create([
+            FarmTransaction(
+                farm=farm,
+                transaction_type='seed_purchase',
+                amount=-crop_type.seed_price,
+                crop_type=crop_type,
+                description=f'Planted {crop_type.name} in plot {plot.plot_number}'
+            )
+            for plot in plots
+        ])
+
+        farm.energy -= energy_used
+        farm.save(update_fields=['energy', 'last_energy_update'])
+
+    logger.info(f"Farm {farm.pk} planted {crop_type.name} in {len(plots)} plots")
+    return {
+        'farm': farm,
+        'plots': plots,
+        'seeds_cost': seeds_cost,
+        'energy_used': energy_used,
+    }
@@ -40,13 +40,13 @@ def farm_view(request):
                     state='empty'
                 )
         
-        # Update farm state
-        farm.update_energy()
+        # Derive current energy and plot states (nothing is written)
+        now = timezone.now()
+        farm.refresh_energy(now)
         
-        # Get all plots and update their states
-        plots = farm.plots.all().order_by('plot_number')
+        plots = list(farm.plots.select_related('crop_type').order_by('plot_number'))
         for plot in plots:
-            plot.update_state()
+            plot.refresh_state(now)
         
         # Get available crop types for this level
         available_crops = CropType.objects.filter(min_level_required__lte=farm.level)
@@ -127,9 +127,6 @@ def plant_crop_api(request):
                 description=f'Planted {crop_type.name} in plot {plot.plot_number}'
             )
             
-            # Update farm energy
-            plot.farm.update_energy()
-            
             return JsonResponse({
                 'success': True,
                 'message': f'Successfully planted {crop_type.emoji} {crop_type.name}!',
@@ -254,12 +251,13 @@ def farm_status_api(request):
     """API endpoint to get current farm status"""
     try:
         farm = request.user.farm
-        farm.update_energy()
+        now = timezone.now()
+        farm.refresh_energy(now)
         
-        # Update all plot states
+        # Current plot states, derived without writing
         plots_data = []
-        for plot in farm.plots.all().order_by('plot_number'):
-            plot.update_state()
+        for plot in farm.plots.select_related('crop_type').order_by('plot_number'):
+            plot.refresh_state(now)
             plot_data = {
                 'id': plot.id,
                 'plot_number': plot.plot_number,
@@ -143,6 +143,31 @@ else:
         }
     }
 
+# Presence tracking
+PRESENCE_TIMEOUT = 300  # Seconds without a heartbeat before a user counts as offline
+PRESENCE_FLUSH_INTERVAL = 60  # Seconds between batched last_seen writes
+PRESENCE_KEEPALIVE_INTERVAL = 100  # Seconds between server-side heartbeats for open sockets
+
+# Caro quick match
+CARO_MATCHMAKING_BACKEND = 'redis' if os.getenv('REDIS_URL') else 'memory'  # Redis shares the queue across workers
+CARO_MATCHMAKING_BETS = (5000, 10000, 20000, 50000)  # One queue bucket per bet amount
+CARO_MATCHMAKING_TICKET_TTL = 120  # Seconds a queued player waits before re-polling
+
+# Caro game clocks
+CARO_TURN_TIMEOUT = 120  # Seconds a player has to move before forfeiting
+CARO_WAITING_TIMEOUT = 600  # Seconds an unjoined room stays open before its bet is refunded
+CARO_TIMER_SYNC_INTERVAL = 5  # Seconds between timer syncs with the database
+
+# Caro spectators
+CARO_SPECTATOR_FANOUT_INTERVAL = 1.0  # Seconds between merged spectator updates
+
+# House account
+HOUSE_ACCOUNT_SHARDS = 16  # Counter rows house fees are spread over
+HOUSE_ROLLUP_INTERVAL = 300  # Seconds between roll-ups of the shards
+
+# Wallet balance cache
+WALLET_BALANCE_CACHE_TIMEOUT = 300  # Seconds a cached (balance, version) pair is trusted
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
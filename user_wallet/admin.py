@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Wallet, WalletTransaction
+from .models import (
+    Wallet, WalletTransaction, WalletDailyRollup, HouseAccountShard, HouseAccountRollup, ReconciliationRun
+)
 
 
 @admin.register(Wallet)
@@ -18,3 +20,32 @@ class WalletTransactionAdmin(admin.ModelAdmin):
     search_fields = ['wallet__user__username', 'description']
     readonly_fields = ['created_at']
     ordering = ['-created_at']
+
+
+@admin.register(WalletDailyRollup)
+class WalletDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['wallet', 'date', 'transaction_type', 'count', 'earned', 'spent']
+    list_filter = ['transaction_type', 'date']
+    search_fields = ['wallet__user__username']
+    ordering = ['-date']
+
+
+@admin.register(HouseAccountShard)
+class HouseAccountShardAdmin(admin.ModelAdmin):
+    list_display = ['shard', 'balance', 'updated_at']
+    readonly_fields = ['updated_at']
+    ordering = ['shard']
+
+
+@admin.register(HouseAccountRollup)
+class HouseAccountRollupAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'amount', 'total']
+    readonly_fields = ['created_at']
+    ordering = ['-created_at']
+
+
+@admin.register(ReconciliationRun)
+class ReconciliationRunAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'finished_at', 'full', 'high_water_id', 'wallets_checked', 'transactions_checked', 'discrepancies']
+    readonly_fields = ['started_at']
+    ordering = ['-started_at']
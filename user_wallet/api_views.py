@@ -4,7 +4,12 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from django.db.models import Q, Sum, Count
+from django.http import HttpResponse
 
+from love_chat.pagination import KeysetPagination
+
+from . import balances, rollups
+from .ledger import IdempotencyConflict
 from .models import Wallet, WalletTransaction
 from .serializers import (
     WalletSerializer, WalletTransactionSerializer,
@@ -31,12 +36,30 @@ class WalletViewSet(viewsets.ReadOnlyModelViewSet):
         )
         return wallet
 
+    def _idempotency_key(self, request):
+        """Client retry key, scoped to the user so keys cannot collide across accounts"""
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return None
+        return f'{request.user.pk}:{key[:80]}'
+
+    def _not_modified(self, current):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = current.etag
+        return response
+
     @action(detail=False, methods=['get'])
     def my_wallet(self, request):
-        """Get current user's wallet"""
+        """Get current user's wallet; 304 when If-None-Match names the current version"""
+        current = balances.is_current(request, request.user.pk)
+        if current:
+            return self._not_modified(current)
+        
         wallet = self.get_object()
         serializer = self.get_serializer(wallet)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        response['ETag'] = balances.make_etag(request.user.pk, wallet.version)
+        return response
 
     @action(detail=False, methods=['post'])
     def add_balance(self, request):
@@ -48,7 +71,12 @@ class WalletViewSet(viewsets.ReadOnlyModelViewSet):
         description = serializer.validated_data['description']
         
         wallet = self.get_object()
-        wallet.add_balance(amount, 'admin_add', description)
+        try:
+            wallet.add_balance(amount, 'admin_add', description,
+                               idempotency_key=self._idempotency_key(request))
+        except IdempotencyConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        wallet.refresh_from_db(fields=['balance', 'version'])
         
         return Response({
             'message': f'Added {amount:,} đồng to wallet',
@@ -66,12 +94,16 @@ class WalletViewSet(viewsets.ReadOnlyModelViewSet):
         wallet = serializer.validated_data['wallet']
         
         try:
-            wallet.deduct_balance(amount, 'admin_deduct', description)
+            wallet.deduct_balance(amount, 'admin_deduct', description,
+                                  idempotency_key=self._idempotency_key(request))
+            wallet.refresh_from_db(fields=['balance', 'version'])
             
             return Response({
                 'message': f'Deducted {amount:,} đồng from wallet',
                 'wallet': self.get_serializer(wallet).data
             })
+        except IdempotencyConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -79,30 +111,33 @@ class WalletViewSet(viewsets.ReadOnlyModelViewSet):
     def stats(self, request):
         """Get wallet statistics"""
         wallet = self.get_object()
-        transactions = wallet.transactions.all()
-        
-        # Calculate stats
-        total_transactions = transactions.count()
-        
-        earned_transactions = transactions.filter(amount__gt=0)
-        spent_transactions = transactions.filter(amount__lt=0)
-        
-        total_earned = earned_transactions.aggregate(Sum('amount'))['amount__sum'] or 0
-        total_spent = abs(spent_transactions.aggregate(Sum('amount'))['amount__sum'] or 0)
-        
-        recent_transactions = transactions[:10]
         
-        stats_data = {
-            'total_transactions': total_transactions,
-            'total_earned': total_earned,
-            'total_spent': total_spent,
+        # Totals come from the daily rollups, not a scan of the ledger
+        stats_data = rollups.summarize(wallet)
+        stats_data.update({
             'current_balance': wallet.balance,
-            'recent_transactions': recent_transactions
-        }
+            'recent_transactions': wallet.transactions.all()[:10]
+        })
         
         serializer = WalletStatsSerializer(stats_data)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Earnings and expenses by type and by day (``?days=``, default 30)"""
+        try:
+            days = max(1, min(int(request.query_params.get('days', 30)), 366))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        wallet = self.get_object()
+        return Response({
+            'days': days,
+            'totals': rollups.summarize(wallet, days),
+            'by_type': rollups.by_type(wallet, days),
+            'by_day': rollups.by_day(wallet, days),
+        })
+
 
 class WalletTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -110,18 +145,26 @@ class WalletTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = WalletTransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    # Append-only ledger: fixed (-created_at, -id) order, keyset pages without COUNT
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend]
     filterset_fields = ['transaction_type']
-    ordering_fields = ['amount', 'created_at']
-    ordering = ['-created_at']
 
     def get_queryset(self):
         user = self.request.user
         try:
             wallet = user.wallet
-            return WalletTransaction.objects.filter(wallet=wallet)
+            transactions = WalletTransaction.objects.filter(wallet=wallet).select_related('wallet__user')
         except Wallet.DoesNotExist:
             return WalletTransaction.objects.none()
+        
+        # ?sign=credit|debit, served by the partial indexes on amount sign
+        sign = self.request.query_params.get('sign')
+        if sign == 'credit':
+            transactions = transactions.filter(amount__gt=0)
+        elif sign == 'debit':
+            transactions = transactions.filter(amount__lt=0)
+        return transactions
 
     @action(detail=False, methods=['get'])
     def recent(self, request):
@@ -133,7 +176,7 @@ class WalletTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def earnings(self, request):
         """Get earning transactions only"""
-        transactions = self.get_queryset().filter(amount__gt=0)
+        transactions = self.filter_queryset(self.get_queryset()).filter(amount__gt=0)
         page = self.paginate_queryset(transactions)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -145,7 +188,7 @@ class WalletTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def expenses(self, request):
         """Get expense transactions only"""
-        transactions = self.get_queryset().filter(amount__lt=0)
+        transactions = self.filter_queryset(self.get_queryset()).filter(amount__lt=0)
         page = self.paginate_queryset(transactions)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
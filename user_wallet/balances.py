@@ -0,0 +1,87 @@
+"""
+Versioned wallet balance cache
+
+Every ledger posting bumps ``Wallet.version`` in the same UPDATE that
+moves the balance, and after commit stores the new pair in the cache:
+
+    wallet_balance_<user id>  ->  (version, balance)
+
+Balance polls read through this key, so a poll is one cache read and no
+query. The version is also the ETag (``"w<user id>-<version>"``) and is
+pushed with every ``wallet.updated`` event: a client that already holds
+the current version gets a 304, or no message at all over the socket.
+
+Postings committed out of order cannot move the cached version
+backwards, and the timeout bounds any remaining staleness. A direct
+``Wallet.save()`` (admin, shell) bumps the version as well and drops the
+cached pair after commit.
+"""
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Wallet
+
+BALANCE_CACHE_TIMEOUT = getattr(settings, 'WALLET_BALANCE_CACHE_TIMEOUT', 300)
+
+
+class Balance(NamedTuple):
+    balance: int
+    version: int
+    etag: str
+
+
+def _cache_key(user_id):
+    return f'wallet_balance_{user_id}'
+
+
+def make_etag(user_id, version):
+    return f'"w{user_id}-{version}"'
+
+
+def _balance(user_id, version, balance):
+    return Balance(balance, version, make_etag(user_id, version))
+
+
+def get_balance(user_id):
+    """Current (balance, version) for a user's wallet, or None if there is no wallet"""
+    cached = cache.get(_cache_key(user_id))
+    if cached is not None:
+        return _balance(user_id, *cached)
+
+    row = Wallet.objects.filter(user_id=user_id).values_list('version', 'balance').first()
+    if row is None:
+        return None
+    # add(), not set(): a posting that committed meanwhile has stored a newer pair
+    cache.add(_cache_key(user_id), row, BALANCE_CACHE_TIMEOUT)
+    return _balance(user_id, *row)
+
+
+def store(user_id, balance, version):
+    """Cache a committed balance unless a newer version is already there"""
+    cached = cache.get(_cache_key(user_id))
+    if cached is not None and cached[0] >= version:
+        return
+    cache.set(_cache_key(user_id), (version, balance), BALANCE_CACHE_TIMEOUT)
+
+
+def invalidate(user_id):
+    """Drop the cached pair once the current transaction commits (direct Wallet saves)"""
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
+
+
+def is_current(request, user_id):
+    """
+    The cached Balance when the request's If-None-Match names it, else None.
+
+    Lets a view answer 304 before doing any other work.
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return None
+    current = get_balance(user_id)
+    if current and current.etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return current
+    return None
@@ -0,0 +1,231 @@
+"""
+Wallet ledger
+
+Every balance change goes through post_entry() / post_entries(): inside
+one database transaction they lock the wallet rows, apply the change as
+an ``F()`` UPDATE and write the matching WalletTransactions. Concurrent
+payouts on the same wallet therefore queue on the row lock instead of
+overwriting each other's ``balance``. Daily rollups (user_wallet.rollups)
+are updated in the same transaction.
+
+Realtime ``wallet.updated`` events are sent after commit, one per user
+per transaction: postings made at the same level of an enclosing
+transaction (e.g. a request under ATOMIC_REQUESTS that pays out several
+plots) are merged into a single event with the final balance. Each
+posting bumps ``Wallet.version``, and the committed (balance, version)
+pair is written to the balance cache (user_wallet.balances).
+
+Callers may pass an idempotency key (e.g. the client's ``Idempotency-Key``
+header). A key that was already used returns the original transaction
+instead of applying the change again, so retried requests are safe.
+"""
+import logging
+import threading
+import weakref
+from typing import NamedTuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import balances, rollups
+from .models import Wallet, WalletTransaction
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientBalance(ValueError):
+    """The debit would take the wallet below zero"""
+
+
+class IdempotencyConflict(ValueError):
+    """The idempotency key was already used for different entries"""
+
+
+class Entry(NamedTuple):
+    """One signed balance change; ``wallet`` is a Wallet or its pk"""
+    wallet: object
+    amount: int
+    transaction_type: str
+    description: str = ''
+    game: object = None
+    idempotency_key: object = None
+
+
+def post_entry(wallet, amount, transaction_type, description='', game=None, idempotency_key=None):
+    """
+    Apply a signed ``amount`` to ``wallet`` (a Wallet or its pk).
+
+    Returns the WalletTransaction, either the new one or, for a replayed
+    idempotency key, the one recorded the first time.
+    """
+    entry = Entry(wallet, amount, transaction_type, description, game, idempotency_key)
+    return post_entries([entry])[0]
+
+
+def post_entries(entries):
+    """
+    Apply several entries, possibly across wallets, all or nothing.
+
+    Wallets are locked in primary-key order, so concurrent batches over
+    the same wallets cannot deadlock. Each wallet gets one UPDATE, the
+    rows are written with one bulk INSERT, and after commit every user
+    gets a single notification with their final balance. Returns the
+    WalletTransactions in the order of ``entries``.
+    """
+    entries = [Entry(*entry) for entry in entries]
+    if not entries:
+        return []
+    wallet_ids = [getattr(entry.wallet, 'pk', entry.wallet) for entry in entries]
+    keys = [entry.idempotency_key for entry in entries if entry.idempotency_key]
+
+    try:
+        with transaction.atomic():
+            locked = {
+                wallet.pk: wallet
+                for wallet in Wallet.objects.select_for_update().only('id', 'user_id', 'balance', 'version')
+                .filter(pk__in=set(wallet_ids)).order_by('pk')
+            }
+            missing = set(wallet_ids) - set(locked)
+            if missing:
+                raise Wallet.DoesNotExist(f"Wallets not found: {sorted(missing)}")
+
+            if keys:
+                existing = _existing_entries(keys)
+                if existing:
+                    return _replayed(existing, entries, wallet_ids)
+
+            # Running balances: every intermediate balance must stay >= 0
+            balances = {wallet_id: wallet.balance for wallet_id, wallet in locked.items()}
+            rows = []
+            for wallet_id, entry in zip(wallet_ids, entries):
+                if entry.amount < 0 and balances[wallet_id] + entry.amount < 0:
+                    raise InsufficientBalance(
+                        f"Insufficient balance. Required: {-entry.amount:,}, Available: {balances[wallet_id]:,}"
+                    )
+                balances[wallet_id] += entry.amount
+                rows.append(WalletTransaction(
+                    wallet_id=wallet_id,
+                    transaction_type=entry.transaction_type,
+                    amount=entry.amount,
+                    balance_after=balances[wallet_id],
+                    description=entry.description,
+                    game=entry.game,
+                    idempotency_key=entry.idempotency_key or None,
+                ))
+
+            now = timezone.now()
+            for wallet_id, wallet in locked.items():
+                delta = balances[wallet_id] - wallet.balance
+                Wallet.objects.filter(pk=wallet_id).update(
+                    balance=F('balance') + delta,
+                    version=F('version') + 1,
+                    updated_at=now
+                )
+
+            rows = WalletTransaction.objects.bulk_create(rows)
+            rollups.record(rows)
+
+        notifications = {}
+        for row in rows:
+            wallet = locked[row.wallet_id]
+            notifications.setdefault(wallet.user_id, (balances[row.wallet_id], wallet.version + 1, []))[2].append(row)
+        _queue_notifications(notifications)
+    except IntegrityError:
+        # Same key committed concurrently (possibly on another wallet)
+        existing = _existing_entries(keys) if keys else None
+        if not existing:
+            raise
+        return _replayed(existing, entries, wallet_ids)
+
+    return rows
+
+
+def credit(wallet, amount, transaction_type='game_win', description='', game=None, idempotency_key=None):
+    """Add ``amount`` (positive) to the wallet"""
+    if amount <= 0:
+        raise ValueError("Credit amount must be positive")
+    return post_entry(wallet, amount, transaction_type, description, game, idempotency_key)
+
+
+def debit(wallet, amount, transaction_type='game_bet', description='', game=None, idempotency_key=None):
+    """Take ``amount`` (positive) from the wallet; raises InsufficientBalance"""
+    if amount <= 0:
+        raise ValueError("Debit amount must be positive")
+    return post_entry(wallet, -amount, transaction_type, description, game, idempotency_key)
+
+
+def _existing_entries(keys):
+    return {row.idempotency_key: row for row in WalletTransaction.objects.filter(idempotency_key__in=keys)}
+
+
+def _replayed(existing, entries, wallet_ids):
+    """The entries recorded for these keys, if the request is really the same one"""
+    replayed = []
+    for wallet_id, entry in zip(wallet_ids, entries):
+        row = existing.get(entry.idempotency_key) if entry.idempotency_key else None
+        if row is None or (row.wallet_id, row.amount, row.transaction_type) != (wallet_id, entry.amount, entry.transaction_type):
+            raise IdempotencyConflict(
+                f"Idempotency key {entry.idempotency_key!r} does not match the recorded entries"
+            )
+        row.replayed = True
+        replayed.append(row)
+    logger.info(f"Replayed wallet entries {[row.pk for row in replayed]}")
+    return replayed
+
+
+class _PendingNotifications(dict):
+    """user_id -> (final balance, version, rows) waiting for commit; the on_commit callback"""
+
+    def merge(self, notifications):
+        for user_id, (balance, version, rows) in notifications.items():
+            _, _, pending = self.get(user_id, (balance, version, []))
+            self[user_id] = (balance, version, pending + rows)
+
+    def __call__(self):
+        _notify_entries(self)
+
+
+# Pending notifications of this thread by (connection alias, savepoint ids).
+# Values are only referenced strongly by the connection's commit hooks: a
+# rollback discards the hook, and with it the entry here.
+_pending = threading.local()
+
+
+def _queue_notifications(notifications):
+    """
+    Merge into the callback already queued at this savepoint level, or queue one.
+
+    Only an exact savepoint match is merged, so a rolled-back savepoint
+    takes exactly its own postings with it.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _notify_entries(notifications)
+        return
+
+    queued = getattr(_pending, 'by_level', None)
+    if queued is None:
+        queued = _pending.by_level = weakref.WeakValueDictionary()
+
+    key = (connection.alias, tuple(connection.savepoint_ids))
+    pending = queued.get(key)
+    if pending is None:
+        pending = queued[key] = _PendingNotifications()
+        transaction.on_commit(pending)
+    pending.merge(notifications)
+
+
+def _notify_entries(notifications):
+    """Cache each user's new balance, then send one wallet update with the entries just posted"""
+    from chat.realtime_helpers import notify_wallet_entries
+
+    for user_id, (balance, version, rows) in notifications.items():
+        try:
+            balances.store(user_id, balance, version)
+        except Exception as e:
+            logger.error(f"Error caching wallet balance for user {user_id}: {e}")
+        try:
+            notify_wallet_entries(user_id=user_id, balance=balance, transactions=rows, version=version)
+        except Exception as e:
+            logger.error(f"Error sending wallet update to user {user_id}: {e}")
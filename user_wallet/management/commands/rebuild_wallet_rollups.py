@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from user_wallet import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily wallet rollups from the transaction ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--wallet',
+            type=int,
+            action='append',
+            dest='wallets',
+            help='Only rebuild this wallet id (repeatable)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows written per bulk INSERT (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        count = rollups.rebuild(wallet_ids=options['wallets'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {count} wallet rollup rows"))
@@ -0,0 +1,64 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from user_wallet import reconciliation
+
+
+class Command(BaseCommand):
+    help = 'Check that wallet balances and balance_after values match the transaction ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the checkpoint and re-read the whole ledger'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per cursor round trip and checkpoints written per query (default: 2000)'
+        )
+        parser.add_argument(
+            '--settle-seconds',
+            type=int,
+            default=reconciliation.SETTLE_SECONDS,
+            help='Leave activity newer than this for the next run (default: %(default)s)'
+        )
+        parser.add_argument(
+            '--report',
+            help='Write discrepancies to this CSV file'
+        )
+
+    def handle(self, *args, **options):
+        report_file = open(options['report'], 'w', newline='') if options['report'] else None
+        writer = None
+        if report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(reconciliation.Discrepancy._fields)
+
+        found = 0
+        try:
+            for discrepancy in reconciliation.reconcile(
+                full=options['full'],
+                chunk_size=options['chunk_size'],
+                settle_seconds=options['settle_seconds'],
+            ):
+                found += 1
+                if writer:
+                    writer.writerow(discrepancy)
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ Wallet {discrepancy.wallet_id} (user {discrepancy.user_id}) {discrepancy.kind}"
+                    f"{f' at transaction {discrepancy.transaction_id}' if discrepancy.transaction_id else ''}: "
+                    f"expected {discrepancy.expected:,}, found {discrepancy.actual:,}"
+                ))
+        finally:
+            if report_file:
+                report_file.close()
+
+        run = reconciliation.last_run()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Checked {run.wallets_checked} wallets and {run.transactions_checked} transactions "
+            f"(up to #{run.high_water_id}): {found} discrepancies"
+        ))
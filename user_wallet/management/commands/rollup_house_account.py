@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_wallet import house
+
+
+class Command(BaseCommand):
+    help = 'Collect the house account shards into a roll-up row'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and roll up every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=house.ROLLUP_INTERVAL,
+            help=f'Seconds between roll-ups in --loop mode (default: {house.ROLLUP_INTERVAL})'
+        )
+
+    def handle(self, *args, **options):
+        house.ensure_shards()
+
+        while True:
+            rollup = house.roll_up()
+            if rollup:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ Rolled up {rollup.amount:,} đồng, house total {rollup.total:,} đồng"
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS("✅ Nothing to roll up"))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
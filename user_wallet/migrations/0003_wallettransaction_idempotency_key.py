@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0002_alter_wallettransaction_game'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='wallettransaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('initial', 'Initial Balance'), ('game_bet', 'Game Bet'), ('game_win', 'Game Win'), ('game_loss', 'Game Loss'), ('game_refund', 'Game Refund'), ('admin_add', 'Admin Added'), ('admin_deduct', 'Admin Deducted')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0003_wallettransaction_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HouseAccountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.BigIntegerField()),
+                ('total', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'get_latest_by': 'created_at',
+            },
+        ),
+        migrations.CreateModel(
+            name='HouseAccountShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(unique=True)),
+                ('balance', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['shard'],
+            },
+        ),
+    ]
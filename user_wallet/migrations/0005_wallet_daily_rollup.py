@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0004_house_account'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('transaction_type', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('earned', models.BigIntegerField(default=0)),
+                ('spent', models.BigIntegerField(default=0)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='user_wallet.wallet')),
+            ],
+            options={
+                'ordering': ['-date', 'transaction_type'],
+                'indexes': [models.Index(fields=['wallet', '-date'], name='user_wallet_wallet__a2b02d_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='walletdailyrollup',
+            constraint=models.UniqueConstraint(fields=('wallet', 'date', 'transaction_type'), name='unique_wallet_daily_rollup'),
+        ),
+    ]
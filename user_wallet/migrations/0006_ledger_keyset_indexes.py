@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0005_wallet_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='wallettransaction',
+            name='user_wallet_wallet__f92f50_idx',
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', '-created_at', '-id'], name='user_wallet_wallet__d94f18_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', 'transaction_type', '-created_at', '-id'], name='user_wallet_wallet__b6a9b8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(condition=models.Q(('amount__gt', 0)), fields=['wallet', '-created_at', '-id'], name='wallet_txn_credit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(condition=models.Q(('amount__lt', 0)), fields=['wallet', '-created_at', '-id'], name='wallet_txn_debit_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0006_ledger_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('full', models.BooleanField(default=False)),
+                ('from_transaction_id', models.BigIntegerField(default=0)),
+                ('high_water_id', models.BigIntegerField(default=0)),
+                ('wallets_checked', models.IntegerField(default=0)),
+                ('transactions_checked', models.IntegerField(default=0)),
+                ('discrepancies', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WalletCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.BigIntegerField(default=0)),
+                ('high_water_id', models.BigIntegerField(default=0)),
+                ('checked_at', models.DateTimeField()),
+                ('wallet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_checkpoint', to='user_wallet.wallet')),
+            ],
+        ),
+    ]
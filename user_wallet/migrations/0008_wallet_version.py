@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0007_reconciliation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -1,7 +1,5 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 
 
 # ===========================
@@ -12,6 +10,8 @@ class Wallet(models.Model):
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wallet')
     balance = models.IntegerField(default=100000)  # Start with 100,000 đồng
+    # Bumped by every ledger posting; clients send it back to skip unchanged reads
+    version = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -24,45 +24,35 @@ class Wallet(models.Model):
     def __str__(self):
         return f'{self.user.username}: {self.balance:,} đồng'
     
+    def save(self, *args, **kwargs):
+        """Direct saves (admin, shell) bump the version too, so cached balances and ETags go stale"""
+        bump = not self._state.adding
+        if bump:
+            self.version = models.F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['version'])
+            from .balances import invalidate
+            invalidate(self.user_id)
+    
     def has_sufficient_balance(self, amount):
         """Check if user has enough money"""
         return self.balance >= amount
     
-    def deduct_balance(self, amount, transaction_type='game_bet', description='', game=None):
-        """Deduct money from wallet"""
-        if not self.has_sufficient_balance(amount):
-            raise ValueError(f"Insufficient balance. Required: {amount:,}, Available: {self.balance:,}")
-        
-        self.balance -= amount
-        self.save()
-        
-        # Create transaction record
-        WalletTransaction.objects.create(
-            wallet=self,
-            transaction_type=transaction_type,
-            amount=-amount,
-            balance_after=self.balance,
-            description=description,
-            game=game
-        )
-        
+    def deduct_balance(self, amount, transaction_type='game_bet', description='', game=None, idempotency_key=None):
+        """Deduct money from wallet (atomic, see user_wallet.ledger)"""
+        from .ledger import debit
+        entry = debit(self, amount, transaction_type, description, game, idempotency_key)
+        self.balance = entry.balance_after
         return True
     
-    def add_balance(self, amount, transaction_type='game_win', description='', game=None):
-        """Add money to wallet"""
-        self.balance += amount
-        self.save()
-        
-        # Create transaction record
-        WalletTransaction.objects.create(
-            wallet=self,
-            transaction_type=transaction_type,
-            amount=amount,
-            balance_after=self.balance,
-            description=description,
-            game=game
-        )
-        
+    def add_balance(self, amount, transaction_type='game_win', description='', game=None, idempotency_key=None):
+        """Add money to wallet (atomic, see user_wallet.ledger)"""
+        from .ledger import credit
+        entry = credit(self, amount, transaction_type, description, game, idempotency_key)
+        self.balance = entry.balance_after
         return True
 
 
@@ -86,12 +76,18 @@ class WalletTransaction(models.Model):
     description = models.TextField(blank=True)
     # Using string reference to avoid circular import - game field will reference CaroGame for both private and room games
     game = models.ForeignKey('caro_game.CaroGame', on_delete=models.SET_NULL, null=True, blank=True)
+    # Client-supplied key; a repeated key returns the original entry instead of posting twice
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['wallet', '-created_at']),
+            # Keyset pages: (wallet, created_at, id), optionally by type or amount sign
+            models.Index(fields=['wallet', '-created_at', '-id']),
+            models.Index(fields=['wallet', 'transaction_type', '-created_at', '-id']),
+            models.Index(fields=['wallet', '-created_at', '-id'], condition=models.Q(amount__gt=0), name='wallet_txn_credit_idx'),
+            models.Index(fields=['wallet', '-created_at', '-id'], condition=models.Q(amount__lt=0), name='wallet_txn_debit_idx'),
             models.Index(fields=['transaction_type', '-created_at']),
             models.Index(fields=['game']),
         ]
@@ -100,33 +96,96 @@ class WalletTransaction(models.Model):
         return f'{self.wallet.user.username}: {self.amount:+,} đồng ({self.get_transaction_type_display()})'
 
 
+class WalletDailyRollup(models.Model):
+    """Per wallet, day and transaction type totals, kept in step with the ledger"""
+    
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+    earned = models.BigIntegerField(default=0)  # Sum of credits
+    spent = models.BigIntegerField(default=0)  # Sum of debits, as a positive number
+    
+    class Meta:
+        ordering = ['-date', 'transaction_type']
+        constraints = [
+            models.UniqueConstraint(fields=['wallet', 'date', 'transaction_type'], name='unique_wallet_daily_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['wallet', '-date']),
+        ]
+    
+    def __str__(self):
+        return f'{self.wallet.user.username} {self.date} {self.transaction_type}: +{self.earned:,} / -{self.spent:,}'
+
+
 # ===========================
-# REALTIME SIGNALS
+# RECONCILIATION
 # ===========================
+class ReconciliationRun(models.Model):
+    """One pass of ``manage.py reconcile_wallets``; the last finished run is the checkpoint"""
+    
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+    from_transaction_id = models.BigIntegerField(default=0)  # Exclusive lower bound of the scan
+    high_water_id = models.BigIntegerField(default=0)  # Last WalletTransaction id covered
+    wallets_checked = models.IntegerField(default=0)
+    transactions_checked = models.IntegerField(default=0)
+    discrepancies = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f'Reconciliation {self.started_at:%Y-%m-%d %H:%M}: {self.discrepancies} discrepancies'
+
 
-@receiver(post_save, sender=Wallet)
-def wallet_updated(sender, instance, created, **kwargs):
-    """Send realtime update when wallet balance changes"""
-    if not created:  # Only for updates, not creation
-        try:
-            from chat.realtime_helpers import notify_wallet_updated
-            notify_wallet_updated(
-                user_id=instance.user.id,
-                balance=instance.balance
-            )
-        except Exception as e:
-            print(f"Error sending wallet update: {e}")
+class WalletCheckpoint(models.Model):
+    """Sum of a wallet's ledger up to the high-water id of the last finished run"""
+    
+    wallet = models.OneToOneField(Wallet, on_delete=models.CASCADE, related_name='reconciliation_checkpoint')
+    balance = models.BigIntegerField(default=0)
+    high_water_id = models.BigIntegerField(default=0)
+    checked_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f'{self.wallet_id} @ {self.high_water_id}: {self.balance:,}'
 
 
-@receiver(post_save, sender=WalletTransaction)
-def transaction_created(sender, instance, created, **kwargs):
-    """Send realtime update when new transaction is created"""
-    if created:
-        try:
-            from chat.realtime_helpers import notify_wallet_transaction
-            notify_wallet_transaction(
-                user_id=instance.wallet.user.id,
-                transaction=instance
-            )
-        except Exception as e:
-            print(f"Error sending transaction notification: {e}")
+# ===========================
+# HOUSE ACCOUNT
+# ===========================
+class HouseAccountShard(models.Model):
+    """
+    One of N counter rows holding uncollected house fees.
+    
+    Writers pick a shard at random (or by hash) so game settlements don't
+    queue on one hot row; readers sum the shards (see user_wallet.house).
+    """
+    
+    shard = models.PositiveSmallIntegerField(unique=True)
+    balance = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['shard']
+    
+    def __str__(self):
+        return f'House shard {self.shard}: {self.balance:,} đồng'
+
+
+class HouseAccountRollup(models.Model):
+    """Periodic collection of the shard balances into a running total"""
+    
+    amount = models.BigIntegerField()  # Collected from the shards in this roll-up
+    total = models.BigIntegerField()  # House total up to this roll-up
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        get_latest_by = 'created_at'
+    
+    def __str__(self):
+        return f'House roll-up {self.created_at:%Y-%m-%d %H:%M}: +{self.amount:,} (total {self.total:,})'
+
@@ -0,0 +1,131 @@
+"""
+Daily wallet rollups
+
+WalletDailyRollup keeps, per wallet, day and transaction type, the number
+of entries and the credited / debited sums. The ledger calls record()
+inside the same transaction that writes the WalletTransaction rows (with
+the wallet row locked), so rollups never drift from the ledger. Stats
+read a few rollup rows instead of aggregating the whole history.
+
+rebuild() recomputes them from the ledger with one GROUP BY under the
+wallet row locks (``manage.py rebuild_wallet_rollups``).
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Wallet, WalletDailyRollup, WalletTransaction
+
+logger = logging.getLogger(__name__)
+
+
+def record(transactions):
+    """Fold newly written WalletTransactions into their daily rollups"""
+    totals = defaultdict(lambda: [0, 0, 0])
+    for row in transactions:
+        created_at = row.created_at or timezone.now()
+        key = (row.wallet_id, timezone.localdate(created_at), row.transaction_type)
+        total = totals[key]
+        total[0] += 1
+        if row.amount > 0:
+            total[1] += row.amount
+        else:
+            total[2] -= row.amount
+
+    for (wallet_id, date, transaction_type), (count, earned, spent) in totals.items():
+        updated = WalletDailyRollup.objects.filter(
+            wallet_id=wallet_id, date=date, transaction_type=transaction_type
+        ).update(count=F('count') + count, earned=F('earned') + earned, spent=F('spent') + spent)
+        if not updated:
+            WalletDailyRollup.objects.create(
+                wallet_id=wallet_id, date=date, transaction_type=transaction_type,
+                count=count, earned=earned, spent=spent
+            )
+
+
+def summarize(wallet, days=None):
+    """Totals for a wallet (optionally over the last ``days`` days)"""
+    rollups = _rollups(wallet, days)
+    totals = rollups.aggregate(
+        total_transactions=Sum('count'),
+        total_earned=Sum('earned'),
+        total_spent=Sum('spent'),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def by_type(wallet, days=None):
+    """{transaction_type: {count, earned, spent}} for a wallet"""
+    rows = (
+        _rollups(wallet, days)
+        .values('transaction_type')
+        .annotate(count=Sum('count'), earned=Sum('earned'), spent=Sum('spent'))
+        .order_by('transaction_type')
+    )
+    return {
+        row['transaction_type']: {'count': row['count'], 'earned': row['earned'], 'spent': row['spent']}
+        for row in rows
+    }
+
+
+def by_day(wallet, days=30):
+    """[{date, count, earned, spent}] for the last ``days`` days, newest first"""
+    return list(
+        _rollups(wallet, days)
+        .values('date')
+        .annotate(count=Sum('count'), earned=Sum('earned'), spent=Sum('spent'))
+        .order_by('-date')
+    )
+
+
+def _rollups(wallet, days):
+    rollups = WalletDailyRollup.objects.filter(wallet=wallet)
+    if days:
+        rollups = rollups.filter(date__gt=timezone.localdate() - timedelta(days=days))
+    return rollups
+
+
+def rebuild(wallet_ids=None, batch_size=1000):
+    """
+    Recompute rollups from WalletTransaction (all wallets, or the given ones).
+
+    The wallet rows are locked first, the same lock postings take before
+    record(), so no entry can land between the GROUP BY and the rewrite.
+    Postings to those wallets wait until the rebuild commits: this is a
+    maintenance operation.
+    """
+    wallets = Wallet.objects.all()
+    transactions = WalletTransaction.objects.all()
+    rollups = WalletDailyRollup.objects.all()
+    if wallet_ids is not None:
+        wallets = wallets.filter(pk__in=wallet_ids)
+        transactions = transactions.filter(wallet_id__in=wallet_ids)
+        rollups = rollups.filter(wallet_id__in=wallet_ids)
+
+    rows = (
+        transactions
+        .annotate(date=TruncDate('created_at'))
+        .values('wallet_id', 'date', 'transaction_type')
+        .annotate(
+            count=Count('id'),
+            earned=Sum(Case(When(amount__gt=0, then=F('amount')), default=0, output_field=IntegerField())),
+            spent=Sum(Case(When(amount__lt=0, then=-F('amount')), default=0, output_field=IntegerField())),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        list(wallets.select_for_update().order_by('pk').values_list('pk', flat=True))
+        rollups.delete()
+        created = WalletDailyRollup.objects.bulk_create(
+            (WalletDailyRollup(**row) for row in rows.iterator(chunk_size=batch_size)),
+            batch_size=batch_size
+        )
+
+    logger.info(f"Rebuilt {len(created)} wallet rollup rows")
+    return len(created)
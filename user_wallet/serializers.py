@@ -9,9 +9,9 @@ class WalletSerializer(serializers.ModelSerializer):
     class Meta:
         model = Wallet
         fields = [
-            'id', 'user', 'balance', 'created_at', 'updated_at'
+            'id', 'user', 'balance', 'version', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
 
 
 class WalletTransactionSerializer(serializers.ModelSerializer):
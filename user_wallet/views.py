@@ -1,7 +1,8 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseNotModified
 from django.views.decorators.csrf import csrf_exempt
+from . import balances, rollups
 from .models import Wallet, WalletTransaction
 import logging
 
@@ -20,6 +21,7 @@ def wallet_view(request):
         return render(request, 'user_wallet/wallet.html', {
             'wallet': wallet,
             'recent_transactions': recent_transactions,
+            'totals': rollups.summarize(wallet),
         })
         
     except Exception as e:
@@ -32,15 +34,25 @@ def wallet_view(request):
 @login_required 
 @csrf_exempt
 def wallet_balance_api(request):
-    """API endpoint to get current wallet balance"""
+    """API endpoint to get current wallet balance (cached, honours If-None-Match)"""
     if request.method == 'GET':
         try:
-            wallet = request.user.wallet
-            return JsonResponse({
-                'success': True,
-                'balance': wallet.balance,
-                'formatted_balance': f"{wallet.balance:,} đồng"
-            })
+            current = balances.is_current(request, request.user.pk)
+            if current:
+                response = HttpResponseNotModified()
+            else:
+                current = balances.get_balance(request.user.pk)
+                if current is None:
+                    raise Wallet.DoesNotExist(f"No wallet for user {request.user.pk}")
+                response = JsonResponse({
+                    'success': True,
+                    'balance': current.balance,
+                    'version': current.version,
+                    'formatted_balance': f"{current.balance:,} đồng"
+                })
+            response['ETag'] = current.etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
         except Exception as e:
             logger.error(f"Error getting wallet balance for {request.user.username}: {e}")
             return JsonResponse({